@@ -1,14 +1,31 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal
 import json
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+import clock
+from market import get_share_prices
+from database import (
+    transaction,
+    write_account,
+    read_account,
+    read_account_state,
+    read_recent_transactions,
+    read_transaction_stats,
+    read_orders,
+    write_account_state,
+    write_strategy,
+    write_trade,
+    write_portfolio_value,
+    write_log,
+)
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+# How much recent activity the account summary includes, however long the history grows
+SUMMARY_TRANSACTIONS = 10
+SUMMARY_RATIONALE_CHARS = 200
 
 
 class Transaction(BaseModel):
@@ -25,118 +42,172 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class Order(BaseModel):
+    symbol: str = Field(description="The symbol of the stock")
+    side: Literal["buy", "sell"] = Field(description="Whether to buy or sell the shares")
+    quantity: int = Field(gt=0, description="The quantity of shares")
+    rationale: str = Field(description="The rationale for the trade and fit with the account's strategy")
+
+
 class Account(BaseModel):
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
+    cost_basis: dict[str, float] = {}
+    net_invested: float = 0.0
+    version: int = 0
     transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
 
     @classmethod
-    def get(cls, name: str):
-        fields = read_account(name.lower())
+    def get(cls, name: str, with_transactions: bool = True):
+        """ Load the account, creating it if it's new. Without transactions, only its current state is read. """
+        fields = read_account(name.lower()) if with_transactions else read_account_state(name.lower())
+        if fields and not with_transactions:
+            fields["transactions"] = []
         if not fields:
             fields = {
                 "name": name.lower(),
                 "balance": INITIAL_BALANCE,
                 "strategy": "",
                 "holdings": {},
+                "cost_basis": {},
+                "net_invested": 0.0,
                 "transactions": [],
-                "portfolio_value_time_series": []
             }
             write_account(name, fields)
         return cls(**fields)
     
     
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        """ Persist the cash balance and strategy; trades and valuations are appended as they happen. """
+        write_account_state(self.name.lower(), self.balance, self.strategy)
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
+        self.cost_basis = {}
+        self.net_invested = 0.0
         self.transactions = []
-        self.portfolio_value_time_series = []
-        self.save()
+        write_account(self.name.lower(), self.model_dump())
+
+    def refresh(self):
+        """ Reload the balance, holdings and version from the database; call inside a transaction to hold them. """
+        state = read_account_state(self.name)
+        if state:
+            for field in ("balance", "strategy", "holdings", "cost_basis", "net_invested", "version"):
+                setattr(self, field, state[field])
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+        with transaction():
+            self.refresh()
+            self.balance += amount
+            self.save()
         print(f"Deposited ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def withdraw(self, amount: float):
         """ Withdraw funds from the account, ensuring it doesn't go negative. """
-        if amount > self.balance:
-            raise ValueError("Insufficient funds for withdrawal.")
-        self.balance -= amount
+        with transaction():
+            self.refresh()
+            if amount > self.balance:
+                raise ValueError("Insufficient funds for withdrawal.")
+            self.balance -= amount
+            self.save()
         print(f"Withdrew ${amount}. New balance: ${self.balance}")
-        self.save()
+
+    def fill_order(self, order: Order, price: float, timestamp: str) -> Transaction:
+        """ Apply one order at the market price and record the trade; call inside a transaction. """
+        symbol, quantity = order.symbol, order.quantity
+        if order.side == "buy":
+            buy_price = price * (1 + SPREAD)
+            total_cost = buy_price * quantity
+            if total_cost > self.balance:
+                raise ValueError("Insufficient funds to buy shares.")
+            elif price==0:
+                raise ValueError(f"Unrecognized symbol {symbol}")
+            # Update holdings and their running cost basis
+            self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
+            self.cost_basis[symbol] = self.cost_basis.get(symbol, 0.0) + total_cost
+            self.net_invested += total_cost
+            self.balance -= total_cost
+            trade = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=order.rationale)
+        else:
+            if self.holdings.get(symbol, 0) < quantity:
+                raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+            sell_price = price * (1 - SPREAD)
+            total_proceeds = sell_price * quantity
+            # Update holdings, reducing the cost basis in proportion to the shares sold
+            held = self.holdings[symbol]
+            self.holdings[symbol] -= quantity
+            self.cost_basis[symbol] = self.cost_basis.get(symbol, 0.0) * self.holdings[symbol] / held
+            self.net_invested -= total_proceeds
+            self.balance += total_proceeds
+            # If shares are completely sold, remove from holdings
+            if self.holdings[symbol] == 0:
+                del self.holdings[symbol]
+                del self.cost_basis[symbol]
+            trade = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=order.rationale)  # negative quantity for sell
+        write_trade(
+            self.name, self.balance, self.net_invested,
+            symbol, self.holdings.get(symbol, 0), self.cost_basis.get(symbol, 0.0), trade.model_dump(),
+        )
+        self.version += 1
+        return trade
+
+    def execute_orders(self, orders: list[Order]) -> str:
+        """
+        Execute orders as one atomic trade: either every order fills or none does. Sells fill before buys,
+        so their proceeds can fund the purchases. Prices are fetched first; then the account is re-read and
+        updated under the database write lock, so concurrent trades on the same account can't lose updates.
+        """
+        prices = get_share_prices([order.symbol for order in orders])
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with transaction():
+                self.refresh()
+                filled = [
+                    self.fill_order(order, prices.get(order.symbol, 0.0), timestamp)
+                    for order in sorted(orders, key=lambda order: order.side != "sell")
+                ]
+        except Exception:
+            self.refresh()
+            raise
+        self.transactions.extend(filled)
+        for order in orders:
+            write_log(self.name, "account", f"{'Bought' if order.side == 'buy' else 'Sold'} {order.quantity} of {order.symbol}")
+        return "Completed. Latest details:\n" + self.summary()
 
     def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Buy shares of a stock if sufficient funds are available. """
-        price = get_share_price(symbol)
-        buy_price = price * (1 + SPREAD)
-        total_cost = buy_price * quantity
-        
-        if total_cost > self.balance:
-            raise ValueError("Insufficient funds to buy shares.")
-        elif price==0:
-            raise ValueError(f"Unrecognized symbol {symbol}")
-        
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
-        
-        # Update balance
-        self.balance -= total_cost
-        self.save()
-        write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+        return self.execute_orders([Order(symbol=symbol, side="buy", quantity=quantity, rationale=rationale)])
 
     def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Sell shares of a stock if the user has enough shares. """
-        if self.holdings.get(symbol, 0) < quantity:
-            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
-        
-        price = get_share_price(symbol)
-        sell_price = price * (1 - SPREAD)
-        total_proceeds = sell_price * quantity
-        
-        # Update holdings
-        self.holdings[symbol] -= quantity
-        
-        # If shares are completely sold, remove from holdings
-        if self.holdings[symbol] == 0:
-            del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
-
-        # Update balance
-        self.balance += total_proceeds
-        self.save()
-        write_log(self.name, "account", f"Sold {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
-
-    def calculate_portfolio_value(self):
+        return self.execute_orders([Order(symbol=symbol, side="sell", quantity=quantity, rationale=rationale)])
+
+    def get_prices(self) -> dict[str, float]:
+        """ Price every holding in a single market data lookup. """
+        return get_share_prices(self.holdings.keys())
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None):
         """ Calculate the total value of the user's portfolio. """
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
-        return total_value
+        prices = prices if prices is not None else self.get_prices()
+        return self.balance + sum(prices.get(symbol, 0.0) * quantity for symbol, quantity in self.holdings.items())
 
     def calculate_profit_loss(self, portfolio_value: float):
-        """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        """ Calculate profit or loss from the initial spend, using the running net invested. """
+        return portfolio_value - self.net_invested - self.balance
+
+    def calculate_unrealized_profit_loss(self, prices: dict[str, float]) -> dict[str, float]:
+        """ Calculate the profit or loss of each holding against its cost basis. """
+        return {
+            symbol: prices.get(symbol, 0.0) * quantity - self.cost_basis.get(symbol, 0.0)
+            for symbol, quantity in self.holdings.items()
+        }
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,7 +215,7 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(self.calculate_portfolio_value())
 
     def list_transactions(self):
         """ List all transactions made by the user. """
@@ -152,16 +223,53 @@ class Account(BaseModel):
     
     def report(self) -> str:
         """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
+        prices = self.get_prices()
+        portfolio_value = self.calculate_portfolio_value(prices)
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+        write_portfolio_value(self.name, timestamp, portfolio_value)
         pnl = self.calculate_profit_loss(portfolio_value)
         data = self.model_dump()
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
+        data["unrealized_profit_loss"] = self.calculate_unrealized_profit_loss(prices)
         write_log(self.name, "account", f"Retrieved account details")
         return json.dumps(data)
     
+    def summary(self) -> str:
+        """
+        Return a compact json summary of the account for trader prompts: cash, holdings with cost basis
+        and unrealized P&L, totals, the last few transactions, open orders and aggregate trading stats.
+        Its size doesn't grow with the account's history.
+        """
+        prices = self.get_prices()
+        portfolio_value = self.calculate_portfolio_value(prices)
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+        write_portfolio_value(self.name, timestamp, portfolio_value)
+        unrealized = self.calculate_unrealized_profit_loss(prices)
+        recent = read_recent_transactions(self.name, SUMMARY_TRANSACTIONS)
+        for trade in recent:
+            trade["rationale"] = trade["rationale"][:SUMMARY_RATIONALE_CHARS]
+        data = {
+            "name": self.name,
+            "balance": round(self.balance, 2),
+            "holdings": {
+                symbol: {
+                    "quantity": quantity,
+                    "cost_basis": round(self.cost_basis.get(symbol, 0.0), 2),
+                    "price": prices.get(symbol, 0.0),
+                    "unrealized_profit_loss": round(unrealized[symbol], 2),
+                }
+                for symbol, quantity in self.holdings.items()
+            },
+            "total_portfolio_value": round(portfolio_value, 2),
+            "total_profit_loss": round(self.calculate_profit_loss(portfolio_value), 2),
+            "recent_transactions": recent,
+            "open_orders": read_orders(self.name, "open", SUMMARY_TRANSACTIONS),
+            "trading_stats": read_transaction_stats(self.name),
+        }
+        write_log(self.name, "account", "Retrieved account summary")
+        return json.dumps(data)
+
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
         write_log(self.name, "account", f"Retrieved strategy")
@@ -170,7 +278,7 @@ class Account(BaseModel):
     def change_strategy(self, strategy: str) -> str:
         """ At your discretion, if you choose to, call this to change your investment strategy for the future """
         self.strategy = strategy
-        self.save()
+        write_strategy(self.name, strategy)
         write_log(self.name, "account", f"Changed strategy")
         return "Changed strategy"
 
@@ -2,38 +2,172 @@ import mcp
 from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
 from agents import FunctionTool
+from contextlib import asynccontextmanager
+from datetime import timedelta
+import asyncio
 import json
+import os
+import time
+import weakref
+from mcp_params import local_env
 
-params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
+params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=local_env)
+
+# Keep the server warm this long after the last user releases it
+IDLE_SECONDS = float(os.getenv("ACCOUNTS_CLIENT_IDLE_SECONDS", "300"))
+# Ping a session that hasn't been checked for this long before handing it out
+HEALTH_CHECK_SECONDS = 30.0
+PING_TIMEOUT_SECONDS = 5.0
+REQUEST_TIMEOUT_SECONDS = 120.0
+
+
+class AccountsClientPool:
+    """
+    A long-lived, reference-counted session with the accounts server for one event loop.
+    The server subprocess and its ClientSession are owned by a background task, because the stdio
+    client's context managers have to be entered and exited in the same task. Callers borrow the
+    session with `async with pool.session()`; once nobody holds it for IDLE_SECONDS the server
+    is shut down. A session that fails its ping, or whose server has died, is respawned.
+    """
+
+    def __init__(self, server_params: StdioServerParameters = params, idle_seconds: float = IDLE_SECONDS):
+        self.server_params = server_params
+        self.idle_seconds = idle_seconds
+        self.spawns = 0
+        self._session = None
+        self._task = None
+        self._stop = None
+        self._refs = 0
+        self._idle_task = None
+        self._last_checked = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _serve(self, ready: asyncio.Future) -> None:
+        try:
+            async with stdio_client(self.server_params) as streams:
+                async with mcp.ClientSession(
+                    *streams, read_timeout_seconds=timedelta(seconds=REQUEST_TIMEOUT_SECONDS)
+                ) as session:
+                    await session.initialize()
+                    self._session = session
+                    ready.set_result(session)
+                    await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self._session = None
+
+    async def _start(self) -> None:
+        self._stop = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._serve(ready))
+        await ready
+        self.spawns += 1
+        self._last_checked = time.monotonic()
+
+    async def _shutdown(self) -> None:
+        if self._task is not None:
+            self._stop.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._session = None
+
+    async def _is_healthy(self) -> bool:
+        if self._session is None or self._task is None or self._task.done() or self._stop.is_set():
+            return False
+        if time.monotonic() - self._last_checked < HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            await asyncio.wait_for(self._session.send_ping(), PING_TIMEOUT_SECONDS)
+        except Exception:
+            return False
+        self._last_checked = time.monotonic()
+        return True
+
+    def mark_unhealthy(self) -> None:
+        """Force a health check before the session is next handed out, e.g. after a failed request."""
+        self._last_checked = 0.0
+
+    async def _close_when_idle(self) -> None:
+        await asyncio.sleep(self.idle_seconds)
+        async with self._lock:
+            if self._refs == 0:
+                await self._shutdown()
+
+    @asynccontextmanager
+    async def session(self):
+        self._refs += 1
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            self._idle_task = None
+        try:
+            async with self._lock:
+                if not await self._is_healthy():
+                    await self._shutdown()
+                    await self._start()
+                session = self._session
+            yield session
+        finally:
+            self._refs -= 1
+            if self._refs == 0:
+                self._idle_task = asyncio.create_task(self._close_when_idle())
+
+    async def request(self, fn, retry: bool = True):
+        """Run fn(session), retrying once on a fresh session if the request fails and retry is safe."""
+        for attempt in range(2 if retry else 1):
+            async with self.session() as session:
+                try:
+                    return await fn(session)
+                except Exception:
+                    self.mark_unhealthy()
+                    if attempt or not retry:
+                        raise
+
+    async def close(self) -> None:
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            self._idle_task = None
+        async with self._lock:
+            await self._shutdown()
+
+
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_pool() -> AccountsClientPool:
+    loop = asyncio.get_running_loop()
+    if loop not in _pools:
+        _pools[loop] = AccountsClientPool()
+    return _pools[loop]
+
+
+@asynccontextmanager
+async def accounts_session():
+    """Hold the accounts server open for the duration of the block, e.g. across trading rounds."""
+    async with get_pool().session() as session:
+        yield session
 
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    tools_result = await get_pool().request(lambda session: session.list_tools())
+    return tools_result.tools
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    # Tool calls can trade, so they are not retried in case the first attempt reached the server
+    return await get_pool().request(lambda session: session.call_tool(tool_name, tool_args), retry=False)
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    result = await get_pool().request(lambda session: session.read_resource(f"accounts://accounts_server/{name}"))
+    return result.contents[0].text
+
+async def read_summary_resource(name):
+    result = await get_pool().request(lambda session: session.read_resource(f"accounts://summary/{name}"))
+    return result.contents[0].text
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    result = await get_pool().request(lambda session: session.read_resource(f"accounts://strategy/{name}"))
+    return result.contents[0].text
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -47,4 +181,4 @@ async def get_accounts_tools_openai():
                 
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
@@ -1,5 +1,9 @@
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from accounts import Account, Order
+from analytics import analytics_report
+import order_book
+from metrics import observe_database_writes
+import json
 
 mcp = FastMCP("accounts_server")
 
@@ -10,7 +14,7 @@ async def get_balance(name: str) -> float:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).balance
+    return Account.get(name, with_transactions=False).balance
 
 @mcp.tool()
 async def get_holdings(name: str) -> dict[str, int]:
@@ -19,7 +23,7 @@ async def get_holdings(name: str) -> dict[str, int]:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).holdings
+    return Account.get(name, with_transactions=False).holdings
 
 @mcp.tool()
 async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
@@ -31,7 +35,7 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    return Account.get(name, with_transactions=False).buy_shares(symbol, quantity, rationale)
 
 
 @mcp.tool()
@@ -44,7 +48,63 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    return Account.get(name, with_transactions=False).sell_shares(symbol, quantity, rationale)
+
+@mcp.tool()
+async def execute_orders(name: str, orders: list[Order]) -> str:
+    """Execute several buy and sell orders together, for example to rebalance the portfolio.
+    The orders are all-or-nothing: if any order can't be filled, none of them are executed.
+    Sells are executed before buys, so their proceeds can fund the purchases.
+
+    Args:
+        name: The name of the account holder
+        orders: The orders, each with a symbol, a side of "buy" or "sell", a quantity of shares and a rationale
+    """
+    return Account.get(name, with_transactions=False).execute_orders(orders)
+
+@mcp.tool()
+async def place_order(
+    name: str, symbol: str, side: str, order_type: str, quantity: int, trigger_price: float, rationale: str
+) -> str:
+    """Place a standing limit or stop order, which is filled automatically at the market price once the
+    price reaches trigger_price, so you don't need to keep checking the price yourself.
+    A limit order buys at or below trigger_price, or sells at or above it.
+    A stop order buys at or above trigger_price, or sells at or below it.
+    Orders stay open until they are filled or cancelled.
+
+    Args:
+        name: The name of the account holder
+        symbol: The symbol of the stock
+        side: "buy" or "sell"
+        order_type: "limit" or "stop"
+        quantity: The quantity of shares
+        trigger_price: The price at which the order should be filled
+        rationale: The rationale for the order and fit with the account's strategy
+    """
+    order_id = order_book.place_order(name, symbol, side, order_type, quantity, trigger_price, rationale)
+    return f"Placed order {order_id}"
+
+@mcp.tool()
+async def cancel_order(name: str, order_id: int) -> str:
+    """Cancel one of your open orders.
+
+    Args:
+        name: The name of the account holder
+        order_id: The id of the order to cancel
+    """
+    if order_book.cancel_order(name, order_id):
+        return f"Cancelled order {order_id}"
+    return f"Order {order_id} is not an open order for {name}"
+
+@mcp.tool()
+async def list_orders(name: str, status: str = "open") -> list[dict]:
+    """List your most recent orders with the given status.
+
+    Args:
+        name: The name of the account holder
+        status: "open", "filled", "cancelled" or "rejected"
+    """
+    return order_book.list_orders(name, status)
 
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
@@ -54,17 +114,31 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    return Account.get(name, with_transactions=False).change_strategy(strategy)
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
     account = Account.get(name.lower())
     return account.report()
 
+@mcp.resource("accounts://summary/{name}")
+async def read_summary_resource(name: str) -> str:
+    account = Account.get(name.lower(), with_transactions=False)
+    return account.summary()
+
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
-    account = Account.get(name.lower())
+    account = Account.get(name.lower(), with_transactions=False)
     return account.get_strategy()
 
+@mcp.resource("accounts://analytics")
+async def read_analytics_resource() -> str:
+    return json.dumps(analytics_report())
+
+@mcp.resource("accounts://analytics/{name}")
+async def read_trader_analytics_resource(name: str) -> str:
+    return json.dumps(analytics_report(name))
+
 if __name__ == "__main__":
+    observe_database_writes()
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,90 @@
+import math
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from database import analytics_version, read_all_portfolio_series, read_all_transactions
+from market import get_share_prices
+
+TRADING_DAYS_PER_YEAR = 252
+
+METRICS = ["value", "total_return", "volatility", "sharpe", "max_drawdown", "turnover"]
+
+
+def series_metrics(series: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return, volatility, Sharpe ratio and max drawdown for every account at once, from a frame of daily
+    (name, day, open, close) portfolio values ordered by account and day. Volatility and Sharpe are
+    annualized from daily returns, with a zero risk-free rate.
+    """
+    closes = series.groupby("name", sort=False)["close"]
+    drawdown = series["close"] / closes.cummax() - 1
+    daily_returns = closes.pct_change()
+    by_name = daily_returns.groupby(series["name"], sort=False)
+    mean, std = by_name.mean(), by_name.std()
+    return pd.DataFrame({
+        "value": closes.last(),
+        "total_return": closes.last() / series.groupby("name", sort=False)["open"].first() - 1,
+        "volatility": std * math.sqrt(TRADING_DAYS_PER_YEAR),
+        "sharpe": (mean / std.replace(0, np.nan)) * math.sqrt(TRADING_DAYS_PER_YEAR),
+        "max_drawdown": drawdown.groupby(series["name"], sort=False).min(),
+        "mean_value": closes.mean(),
+    })
+
+
+def attribution(transactions: pd.DataFrame, prices: dict[str, float]) -> pd.DataFrame:
+    """
+    Profit or loss per account and symbol: the cash each symbol's trades paid out or took in, plus
+    the current value of any shares still held. Realized and unrealized gains are both included.
+    """
+    flows = transactions.assign(cash=-transactions["quantity"] * transactions["price"])
+    positions = flows.groupby(["name", "symbol"], sort=False)[["quantity", "cash"]].sum()
+    price = positions.index.get_level_values("symbol").map(prices).to_numpy(dtype=float, na_value=np.nan)
+    held_value = positions["quantity"].to_numpy() * np.nan_to_num(price)
+    return positions.assign(profit_loss=positions["cash"].to_numpy() + held_value)
+
+
+def compute_analytics(series: pd.DataFrame, transactions: pd.DataFrame, prices: dict[str, float]) -> pd.DataFrame:
+    """
+    Portfolio metrics for every account, one row per account name, plus an "attribution" column
+    mapping each symbol traded to its profit or loss. Turnover is the total traded notional divided by
+    the average portfolio value.
+    """
+    metrics = series_metrics(series) if len(series) else pd.DataFrame(columns=METRICS + ["mean_value"])
+    notional = (transactions["quantity"].abs() * transactions["price"]).groupby(transactions["name"]).sum()
+    metrics["turnover"] = notional.reindex(metrics.index, fill_value=0.0).astype(float) / metrics["mean_value"]
+    pnl = attribution(transactions, prices)["profit_loss"]
+    metrics["attribution"] = [
+        pnl.xs(name, level="name").round(2).to_dict() if name in pnl.index.get_level_values("name") else {}
+        for name in metrics.index
+    ]
+    return metrics[METRICS + ["attribution"]]
+
+
+@lru_cache(maxsize=1)
+def _analytics_for(version: tuple) -> pd.DataFrame:
+    series = pd.DataFrame(read_all_portfolio_series("day"), columns=["name", "day", "open", "close"])
+    transactions = pd.DataFrame(read_all_transactions(), columns=["name", "symbol", "quantity", "price"])
+    prices = get_share_prices(transactions["symbol"].unique().tolist()) if len(transactions) else {}
+    return compute_analytics(series, transactions, prices)
+
+
+def get_analytics() -> pd.DataFrame:
+    """
+    Analytics for all traders, recomputed only when a portfolio value or trade has been recorded since
+    the last call, so dashboard refreshes and repeated resource reads are cheap.
+    """
+    return _analytics_for(analytics_version())
+
+
+def analytics_report(name: str | None = None) -> dict:
+    """The analytics as plain JSON-ready values, for every trader or just the named one."""
+    analytics = get_analytics()
+    if name is not None:
+        analytics = analytics.loc[analytics.index == name.lower()]
+    return {
+        trader: {
+            key: (None if isinstance(value, float) and math.isnan(value) else value)
+            for key, value in row.items()
+        }
+        for trader, row in analytics.iterrows()
+    }
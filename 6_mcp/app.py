@@ -1,10 +1,15 @@
 import gradio as gr
+import threading
+from collections import defaultdict, deque
+from gradio.components.plot import PlotData
 from util import css, js, Color
 import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from analytics import get_analytics
+from database import account_version, analytics_version, read_log_before, read_portfolio_series
+from log_feed import log_feed
 
 mapper = {
     "trace": Color.WHITE,
@@ -15,16 +20,65 @@ mapper = {
     "account": Color.RED,
 }
 
+LOG_LINES = 13
+
+
+def format_column(values: pd.Series, template: str) -> pd.Series:
+    return values.map(lambda value: "-" if pd.isna(value) else template.format(value))
+
+
+def plot_payload(fig) -> PlotData:
+    """Serialize a Plotly figure once, in the form gr.Plot sends to the browser."""
+    return PlotData(type="plotly", plot=fig.to_json())
+
+
+def table_payload(df: pd.DataFrame) -> dict:
+    """A DataFrame as the plain headers and rows that gr.Dataframe sends to the browser."""
+    return {"headers": list(df.columns), "data": df.values.tolist()}
+
+
+class RenderCache:
+    """
+    Rendered chart and table payloads shared by every browser session, each stored with the version of
+    the data it was rendered from. A payload is rendered again only when its version changes, and
+    sessions asking for the same payload at once wait for a single render.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = defaultdict(threading.Lock)
+
+    def get(self, key, version, render):
+        with self._locks[key]:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                entry = (version, render())
+                self._entries[key] = entry
+            return entry[1]
+
+
+render_cache = RenderCache()
+
 
 class Trader:
     def __init__(self, name: str, lastname: str, model_name: str):
         self.name = name
         self.lastname = lastname
         self.model_name = model_name
+        self.version = account_version(name)
         self.account = Account.get(name)
+        self._lock = threading.Lock()
 
     def reload(self):
-        self.account = Account.get(self.name)
+        """Reload the account, but only if it has changed since it was last loaded."""
+        with self._lock:
+            version = account_version(self.name)
+            if version != self.version:
+                self.account = Account.get(self.name)
+                self.version = version
+
+    def cached(self, part: str, render, version=None):
+        return render_cache.get((self.name, part), version or self.version, render)
 
     def get_title(self) -> str:
         return f"<div style='text-align: center;font-size:34px;'>{self.name}<span style='color:#ccc;font-size:24px;'> ({self.model_name}) - {self.lastname}</span></div>"
@@ -33,7 +87,7 @@ class Trader:
         return self.account.get_strategy()
 
     def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+        df = pd.DataFrame(read_portfolio_series(self.name), columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
@@ -74,23 +128,52 @@ class Trader:
 
     def get_portfolio_value(self) -> str:
         """Calculate total portfolio value based on current prices"""
-        portfolio_value = self.account.calculate_portfolio_value() or 0.0
+        prices = self.account.get_prices()
+        return self.cached(
+            "portfolio_value",
+            lambda: self.render_portfolio_value(prices),
+            version=(self.version, tuple(sorted(prices.items()))),
+        )
+
+    def render_portfolio_value(self, prices: dict[str, float]) -> str:
+        portfolio_value = self.account.calculate_portfolio_value(prices) or 0.0
         pnl = self.account.calculate_profit_loss(portfolio_value) or 0.0
         color = "green" if pnl >= 0 else "red"
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
-    def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
+    def portfolio_value_chart(self) -> PlotData:
+        return self.cached("chart", lambda: plot_payload(self.get_portfolio_value_chart()))
+
+    def holdings_table(self) -> dict:
+        return self.cached("holdings", lambda: table_payload(self.get_holdings_df()))
+
+    def transactions_table(self) -> dict:
+        return self.cached("transactions", lambda: table_payload(self.get_transactions_df()))
+
+    def get_logs_html(self, logs) -> str:
         response = ""
         for log in logs:
-            timestamp, type, message = log
+            _, timestamp, type, message = log
             color = mapper.get(type, Color.WHITE).value
             response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
-        if response != previous:
-            return response
-        return gr.update()
+        return f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
+
+    async def stream_logs(self):
+        """Yield the log panel once on load, then again only when new entries are pushed by the log feed."""
+        subscription = log_feed.subscribe(self.name)
+        try:
+            logs = deque(reversed(read_log_before(self.name, limit=LOG_LINES)), maxlen=LOG_LINES)
+            last_id = logs[-1][0] if logs else 0
+            yield self.get_logs_html(logs)
+            async for entries in subscription:
+                entries = [entry for entry in entries if entry[0] > last_id]
+                if entries:
+                    logs.extend(entries)
+                    last_id = entries[-1][0]
+                    yield self.get_logs_html(logs)
+        finally:
+            subscription.close()
 
 
 class TraderView:
@@ -108,13 +191,13 @@ class TraderView:
                 self.portfolio_value = gr.HTML(self.trader.get_portfolio_value)
             with gr.Row():
                 self.chart = gr.Plot(
-                    self.trader.get_portfolio_value_chart, container=True, show_label=False
+                    self.trader.portfolio_value_chart, container=True, show_label=False
                 )
             with gr.Row(variant="panel"):
-                self.log = gr.HTML(self.trader.get_logs)
+                self.log = gr.HTML()
             with gr.Row():
                 self.holdings_table = gr.Dataframe(
-                    value=self.trader.get_holdings_df,
+                    value=self.trader.holdings_table,
                     label="Holdings",
                     headers=["Symbol", "Quantity"],
                     row_count=(5, "dynamic"),
@@ -124,7 +207,7 @@ class TraderView:
                 )
             with gr.Row():
                 self.transactions_table = gr.Dataframe(
-                    value=self.trader.get_transactions_df,
+                    value=self.trader.transactions_table,
                     label="Recent Transactions",
                     headers=["Timestamp", "Symbol", "Quantity", "Price", "Rationale"],
                     row_count=(5, "dynamic"),
@@ -146,23 +229,96 @@ class TraderView:
             show_progress="hidden",
             queue=False,
         )
-        log_timer = gr.Timer(value=0.5)
-        log_timer.tick(
-            fn=self.trader.get_logs,
-            inputs=[self.log],
+
+    def stream_logs(self, ui: gr.Blocks):
+        ui.load(
+            fn=self.trader.stream_logs,
+            inputs=[],
             outputs=[self.log],
             show_progress="hidden",
-            queue=False,
+            concurrency_limit=None,
         )
 
     def refresh(self):
         self.trader.reload()
         return (
             self.trader.get_portfolio_value(),
-            self.trader.get_portfolio_value_chart(),
-            self.trader.get_holdings_df(),
-            self.trader.get_transactions_df(),
+            self.trader.portfolio_value_chart(),
+            self.trader.holdings_table(),
+            self.trader.transactions_table(),
+        )
+
+
+class AnalyticsView:
+    """A dashboard tab comparing every trader's performance, from the cached analytics."""
+
+    def __init__(self, traders: list[Trader]):
+        self.display_names = {trader.name.lower(): trader.name for trader in traders}
+        self.metrics_table = None
+        self.attribution_chart = None
+
+    def get_metrics_df(self) -> pd.DataFrame:
+        analytics = get_analytics()
+        return pd.DataFrame({
+            "Trader": [self.display_names.get(name, name) for name in analytics.index],
+            "Value": format_column(analytics["value"], "${:,.0f}"),
+            "Return": format_column(analytics["total_return"], "{:+.2%}"),
+            "Volatility": format_column(analytics["volatility"], "{:.1%}"),
+            "Sharpe": format_column(analytics["sharpe"], "{:.2f}"),
+            "Max Drawdown": format_column(analytics["max_drawdown"], "{:.1%}"),
+            "Turnover": format_column(analytics["turnover"], "{:.2f}x"),
+        })
+
+    def get_attribution_chart(self):
+        analytics = get_analytics()
+        rows = [
+            {"Trader": self.display_names.get(name, name), "Symbol": symbol, "P&L": pnl}
+            for name, attribution in analytics["attribution"].items()
+            for symbol, pnl in attribution.items()
+        ]
+        df = pd.DataFrame(rows, columns=["Trader", "Symbol", "P&L"])
+        fig = px.bar(df, x="Symbol", y="P&L", color="Trader", barmode="group")
+        fig.update_layout(
+            height=400,
+            margin=dict(l=40, r=20, t=20, b=40),
+            xaxis_title=None,
+            yaxis_title=None,
+            paper_bgcolor="#bbb",
+            plot_bgcolor="#dde",
         )
+        fig.update_yaxes(tickformat=",.0f")
+        return fig
+
+    def metrics(self) -> dict:
+        return render_cache.get("metrics", analytics_version(), lambda: table_payload(self.get_metrics_df()))
+
+    def attribution_chart_payload(self) -> PlotData:
+        return render_cache.get("attribution", analytics_version(), lambda: plot_payload(self.get_attribution_chart()))
+
+    def make_ui(self):
+        with gr.Column():
+            self.metrics_table = gr.Dataframe(
+                value=self.metrics,
+                label="Performance",
+                headers=["Trader", "Value", "Return", "Volatility", "Sharpe", "Max Drawdown", "Turnover"],
+                col_count=7,
+                elem_classes=["dataframe-fix-small"],
+            )
+            self.attribution_chart = gr.Plot(
+                self.attribution_chart_payload, label="Profit and loss by symbol", container=True
+            )
+
+        timer = gr.Timer(value=120)
+        timer.tick(
+            fn=self.refresh,
+            inputs=[],
+            outputs=[self.metrics_table, self.attribution_chart],
+            show_progress="hidden",
+            queue=False,
+        )
+
+    def refresh(self):
+        return self.metrics(), self.attribution_chart_payload()
 
 
 # Main UI construction
@@ -178,9 +334,15 @@ def create_ui():
     with gr.Blocks(
         title="Traders", css=css, js=js, theme=gr.themes.Default(primary_hue="sky"), fill_width=True
     ) as ui:
-        with gr.Row():
-            for trader_view in trader_views:
-                trader_view.make_ui()
+        with gr.Tabs():
+            with gr.Tab("Traders"):
+                with gr.Row():
+                    for trader_view in trader_views:
+                        trader_view.make_ui()
+            with gr.Tab("Analytics"):
+                AnalyticsView(traders).make_ui()
+        for trader_view in trader_views:
+            trader_view.stream_logs(ui)
 
     return ui
 
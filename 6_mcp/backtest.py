@@ -0,0 +1,79 @@
+import os
+
+# The backtest runs against its own database, price store and simulated clock. Project modules read these
+# settings when they are imported, and pass them on to the MCP servers they launch, so set them first.
+os.environ.setdefault("BACKTEST_DIR", "backtest_data")
+os.environ.setdefault("ACCOUNTS_DB", "backtest.db")
+os.environ["SIMULATED_CLOCK"] = "true"
+# Rerunning a backtest replays the model's recorded answers instead of paying for them again
+os.environ.setdefault("LLM_CACHE_MODE", "auto")
+
+import asyncio
+import sys
+import time
+from datetime import date, datetime, time as time_of_day
+from agents import add_trace_processor
+import llm_cache
+from accounts import Account
+from accounts_client import accounts_session
+from clock import set_now
+from database import write_portfolio_value
+from mcp_fleet import MCPFleet
+from metrics import MetricsProcessor
+from mcp_params import trader_mcp_server_names, trader_mcp_server_params
+from order_book import match_orders
+from price_store import get_price_store
+from reset import reset_traders
+from tracers import LogTracer
+from traders import Trader
+from trading_floor import create_traders
+
+MARKET_CLOSE = time_of_day(16, 0)
+
+# Push notifications would go to a real phone, so the backtest runs the accounts and market servers only;
+# the researcher gets no web tools, since today's news would leak the future into past trading days
+backtest_trader_server_params = [
+    (name, params) for name, params in zip(trader_mcp_server_names, trader_mcp_server_params) if name != "push"
+]
+
+
+async def run_backtest(start: date, end: date, traders: list[Trader]) -> dict[str, float]:
+    """
+    Fast-forward through every trading day in the price store between start and end. On each day the
+    simulated clock is set to the close, every trader runs once against prices as of that day, and the
+    portfolio values are recorded. Returns the final portfolio value of each trader.
+    """
+    days = get_price_store(os.environ["BACKTEST_DIR"]).trading_days(start, end)
+    if not days:
+        raise ValueError(f"No trading days in the price store between {start} and {end}")
+    add_trace_processor(LogTracer())
+    add_trace_processor(MetricsProcessor())
+    reset_traders()
+    values = {}
+    began = time.perf_counter()
+    async with accounts_session(), MCPFleet(
+        [trader.name for trader in traders],
+        trader_server_params=backtest_trader_server_params,
+        researcher_server_params=[],
+    ) as fleet:
+        for number, day in enumerate(days, start=1):
+            close = datetime.combine(day, MARKET_CLOSE)
+            set_now(close)
+            # Standing orders placed on earlier days fill against this day's close before anyone trades
+            match_orders()
+            await asyncio.gather(*[trader.run(fleet) for trader in traders])
+            # Only the current state is needed to value an account, so its history isn't loaded each day
+            for trader in traders:
+                values[trader.name] = Account.get(trader.name, with_transactions=False).calculate_portfolio_value()
+                write_portfolio_value(trader.name, close.strftime("%Y-%m-%d %H:%M:%S"), values[trader.name])
+            rate = number / (time.perf_counter() - began) * 3600
+            summary = ", ".join(f"{name} ${value:,.0f}" for name, value in values.items())
+            print(f"{day} ({number}/{len(days)}, {rate:.0f} days/hour): {summary}")
+    print(llm_cache.stats.summary())
+    return values
+
+
+if __name__ == "__main__":
+    # Usage: python backtest.py 2024-01-02 2024-06-28
+    start, end = (date.fromisoformat(arg) for arg in sys.argv[1:3])
+    asyncio.run(run_backtest(start, end, create_traders()))
@@ -0,0 +1,22 @@
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from database import read_clock, write_clock
+
+load_dotenv(override=True)
+
+# In a backtest, time comes from the clock table so that the trading floor and every MCP server
+# process see the same simulated moment; otherwise it's the wall clock
+SIMULATED_CLOCK = os.getenv("SIMULATED_CLOCK", "false").strip().lower() == "true"
+
+
+def now() -> datetime:
+    if SIMULATED_CLOCK:
+        simulated = read_clock()
+        if simulated:
+            return datetime.fromisoformat(simulated)
+    return datetime.now()
+
+
+def set_now(moment: datetime) -> None:
+    write_clock(moment.isoformat(sep=" "))
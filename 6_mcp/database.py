@@ -1,17 +1,436 @@
+import os
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-DB = "accounts.db"
+DB = os.getenv("ACCOUNTS_DB", "accounts.db")
 
+# Connection tuning: WAL lets the dashboard read while traders write, NORMAL sync is safe under WAL,
+# and the busy timeout makes concurrent MCP server processes wait for the lock instead of failing
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "10000"))
+CACHED_STATEMENTS = 128
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "14"))
+METRICS_RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", "30"))
+
+# Portfolio values are rolled up into fixed-interval buckets at each resolution as they are written.
+# Each entry is (resolution, bucket seconds, how long its buckets are kept; None keeps them forever).
+SERIES_RESOLUTIONS = [
+    ("minute", 60, timedelta(days=2)),
+    ("hour", 3600, timedelta(days=90)),
+    ("day", 86400, None),
+]
+SERIES_MAX_POINTS = int(os.getenv("SERIES_MAX_POINTS", "500"))
+
+_local = threading.local()
+
+# Called with the seconds each write transaction took, lock wait included; metrics.py sets it
+on_write_transaction = None
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def get_connection(path: str = DB) -> sqlite3.Connection:
+    """
+    Return the pooled connection to the database at path for the current thread, opening it on first use.
+    Connections are never shared across threads or across a fork, and because the same
+    SQL strings are reused, sqlite3 keeps the prepared statements cached on each connection.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = _connect(path)
+    return conn
+
+
+@contextmanager
+def transaction(immediate: bool = True, path: str = DB):
+    """
+    Run a block of statements in a single transaction on the pooled connection to the database at path.
+    Writers take the lock up front with BEGIN IMMEDIATE so that busy_timeout applies,
+    rather than failing with 'database is locked' when upgrading a read lock.
+    Nested use joins the outer transaction.
+    """
+    conn = get_connection(path)
+    if conn.in_transaction:
+        yield conn
+        return
+    start = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        # Also undo a failed COMMIT, so the pooled connection isn't left inside a transaction for later callers
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    if on_write_transaction and immediate:
+        on_write_transaction(time.perf_counter() - start)
+
+
+def _migrate_account_blobs(conn: sqlite3.Connection) -> None:
+    """
+    Move accounts stored in the original single-JSON-blob layout into the normalized tables.
+    The old table is kept as accounts_legacy so nothing is lost if the migration needs revisiting.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(accounts)")]
+    if "account" not in columns:
+        return
+    conn.execute("ALTER TABLE accounts RENAME TO accounts_legacy")
+    _create_account_tables(conn)
+    for (json_data,) in conn.execute("SELECT account FROM accounts_legacy").fetchall():
+        _replace_account(conn, json.loads(json_data))
+
+
+def _derive_valuation(transactions: list[dict]) -> tuple[float, dict[str, float]]:
+    """
+    Replay transactions to get the net cash invested and the average cost basis of each holding.
+    Only used to backfill accounts; Account maintains both incrementally as it trades.
+    """
+    net_invested = 0.0
+    held, cost_basis = {}, {}
+    for t in transactions:
+        symbol, quantity = t["symbol"], t["quantity"]
+        net_invested += quantity * t["price"]
+        if quantity > 0:
+            cost_basis[symbol] = cost_basis.get(symbol, 0.0) + quantity * t["price"]
+        elif held.get(symbol):
+            cost_basis[symbol] = cost_basis.get(symbol, 0.0) * (held[symbol] + quantity) / held[symbol]
+        held[symbol] = held.get(symbol, 0) + quantity
+        if not held[symbol]:
+            del held[symbol]
+            cost_basis.pop(symbol, None)
+    return net_invested, cost_basis
+
+
+def _create_account_tables(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS accounts (
+            name TEXT PRIMARY KEY,
+            balance REAL NOT NULL,
+            strategy TEXT NOT NULL DEFAULT '',
+            net_invested REAL NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            cost_basis REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, symbol)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            rationale TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_name ON transactions (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_series (
+            name TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (name, resolution, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _bucket(moment: datetime, seconds: int) -> datetime:
+    """The start of the fixed-interval bucket holding this moment; intervals divide a day evenly."""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = int((moment - midnight).total_seconds())
+    return midnight + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _record_value(conn: sqlite3.Connection, name: str, timestamp: str, value: float) -> None:
+    """Fold one portfolio value into its bucket at every resolution, and drop buckets past their retention."""
+    moment = datetime.fromisoformat(timestamp)
+    for resolution, seconds, retention in SERIES_RESOLUTIONS:
+        bucket = _bucket(moment, seconds).strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute(WRITE_SERIES_SQL, (name, resolution, bucket, value, value, value, value))
+        if retention is not None:
+            cutoff = (moment - retention).strftime("%Y-%m-%d %H:%M:%S")
+            conn.execute(PRUNE_SERIES_SQL, (name, resolution, cutoff))
+
+
+WRITE_ACCOUNT_SQL = '''
+    INSERT INTO accounts (name, balance, strategy, net_invested)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        balance=excluded.balance, strategy=excluded.strategy, net_invested=excluded.net_invested,
+        version=accounts.version + 1
+'''
+WRITE_ACCOUNT_STATE_SQL = '''
+    INSERT INTO accounts (name, balance, strategy)
+    VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        balance=excluded.balance, strategy=excluded.strategy, version=accounts.version + 1
+'''
+WRITE_STRATEGY_SQL = 'UPDATE accounts SET strategy = ?, version = version + 1 WHERE name = ?'
+WRITE_TRADE_SQL = 'UPDATE accounts SET balance = ?, net_invested = ?, version = version + 1 WHERE name = ?'
+READ_ACCOUNT_SQL = 'SELECT balance, strategy, net_invested, version FROM accounts WHERE name = ?'
+WRITE_HOLDING_SQL = '''
+    INSERT INTO holdings (name, symbol, quantity, cost_basis)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(name, symbol) DO UPDATE SET quantity=excluded.quantity, cost_basis=excluded.cost_basis
+'''
+DELETE_HOLDING_SQL = 'DELETE FROM holdings WHERE name = ? AND symbol = ?'
+READ_HOLDINGS_SQL = 'SELECT symbol, quantity, cost_basis FROM holdings WHERE name = ? ORDER BY symbol'
+WRITE_TRANSACTION_SQL = '''
+    INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+READ_TRANSACTIONS_SQL = '''
+    SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+    WHERE name = ?
+    ORDER BY id
+'''
+READ_RECENT_TRANSACTIONS_SQL = '''
+    SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+    WHERE name = ?
+    ORDER BY id DESC
+    LIMIT ?
+'''
+TRANSACTION_STATS_SQL = '''
+    SELECT
+        COUNT(*),
+        TOTAL(quantity > 0),
+        TOTAL(quantity < 0),
+        TOTAL(CASE WHEN quantity > 0 THEN quantity * price END),
+        TOTAL(CASE WHEN quantity < 0 THEN -quantity * price END),
+        MIN(timestamp),
+        MAX(timestamp)
+    FROM transactions
+    WHERE name = ?
+'''
+WRITE_SERIES_SQL = '''
+    INSERT INTO portfolio_series (name, resolution, bucket, open, high, low, close, samples)
+    VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT(name, resolution, bucket) DO UPDATE SET
+        high=MAX(high, excluded.high), low=MIN(low, excluded.low), close=excluded.close, samples=samples + 1
+'''
+PRUNE_SERIES_SQL = 'DELETE FROM portfolio_series WHERE name = ? AND resolution = ? AND bucket < ?'
+SERIES_EXTENT_SQL = '''
+    SELECT MIN(bucket), MAX(bucket) FROM portfolio_series
+    WHERE name = ? AND resolution = ?
+'''
+READ_SERIES_SQL = '''
+    SELECT bucket, close FROM portfolio_series
+    WHERE name = ? AND resolution = ? AND bucket >= ? AND bucket <= ?
+    ORDER BY bucket
+'''
+READ_ALL_SERIES_SQL = '''
+    SELECT name, bucket, open, close FROM portfolio_series
+    WHERE resolution = ?
+    ORDER BY name, bucket
+'''
+READ_ALL_TRANSACTIONS_SQL = 'SELECT name, symbol, quantity, price FROM transactions ORDER BY name, id'
+ANALYTICS_VERSION_SQL = '''
+    SELECT
+        (SELECT COUNT(*) FROM portfolio_series WHERE resolution = 'day'),
+        (SELECT TOTAL(samples) FROM portfolio_series WHERE resolution = 'day'),
+        (SELECT COALESCE(MAX(id), 0) FROM transactions), (SELECT COUNT(*) FROM transactions)
+'''
+ACCOUNT_VERSION_SQL = '''
+    SELECT
+        (SELECT version FROM accounts WHERE name = :name),
+        (SELECT bucket || '|' || samples FROM portfolio_series
+         WHERE name = :name AND resolution = 'minute' ORDER BY bucket DESC LIMIT 1)
+'''
+WRITE_LOG_SQL = '''
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, datetime('now'), ?, ?)
+'''
+WRITE_LOGS_SQL = 'INSERT INTO logs (name, datetime, type, message) VALUES (?, ?, ?, ?)'
+READ_LOG_SQL = '''
+    SELECT datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY id DESC
+    LIMIT ?
+'''
+READ_LOG_SINCE_SQL = '''
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+'''
+READ_LOG_BEFORE_SQL = '''
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ? AND id < ?
+    ORDER BY id DESC
+    LIMIT ?
+'''
+READ_ALL_LOGS_SINCE_SQL = '''
+    SELECT id, name, datetime, type, message FROM logs
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+'''
+ROLLUP_LOGS_SQL = '''
+    INSERT INTO log_rollups (name, day, type, count)
+    SELECT name, date(datetime), type, COUNT(*) FROM logs
+    WHERE id < ?
+    GROUP BY name, date(datetime), type
+    ON CONFLICT(name, day, type) DO UPDATE SET count = count + excluded.count
+'''
+WRITE_MARKET_SQL = '''
+    INSERT INTO market (date, data)
+    VALUES (?, ?)
+    ON CONFLICT(date) DO UPDATE SET data=excluded.data
+'''
+READ_MARKET_SQL = 'SELECT data FROM market WHERE date = ?'
+WRITE_PRICE_SQL = '''
+    INSERT INTO prices (symbol, price, fetched_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(symbol) DO UPDATE SET price=excluded.price, fetched_at=excluded.fetched_at
+    WHERE excluded.fetched_at > prices.fetched_at
+'''
+WRITE_ORDER_SQL = '''
+    INSERT INTO orders (name, symbol, side, type, quantity, trigger_price, rationale, created, updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+READ_ORDERS_SQL = '''
+    SELECT id, symbol, side, type, quantity, trigger_price, rationale, status, created, updated, message
+    FROM orders
+    WHERE name = ? AND (? IS NULL OR status = ?)
+    ORDER BY id DESC
+    LIMIT ?
+'''
+READ_OPEN_ORDERS_SQL = '''
+    SELECT id, name, symbol, side, type, quantity, trigger_price, rationale FROM orders
+    WHERE status = 'open'
+    ORDER BY id
+'''
+CLOSE_ORDER_SQL = '''
+    UPDATE orders SET status = ?, updated = ?, message = ?
+    WHERE id = ? AND status = 'open'
+'''
+CANCEL_OPEN_ORDERS_SQL = '''
+    UPDATE orders SET status = 'cancelled', message = 'Account reset'
+    WHERE name = ? AND status = 'open'
+'''
+READ_SPAN_METRIC_SQL = '''
+    SELECT count, errors, total_seconds, max_seconds, input_tokens, output_tokens, histogram FROM span_metrics
+    WHERE hour = ? AND trader = ? AND model = ? AND kind = ? AND label = ?
+'''
+WRITE_SPAN_METRIC_SQL = '''
+    INSERT OR REPLACE INTO span_metrics
+        (hour, trader, model, kind, label, count, errors, total_seconds, max_seconds, input_tokens, output_tokens, histogram)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+READ_SPAN_METRICS_SQL = '''
+    SELECT hour, trader, model, kind, label, count, errors, total_seconds, max_seconds, input_tokens, output_tokens, histogram
+    FROM span_metrics
+    WHERE hour >= ?
+'''
+WRITE_RESEARCH_SQL = '''
+    INSERT INTO research_cache (tool, key, bucket, words, created, result)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(tool, key, bucket) DO UPDATE SET words=excluded.words, created=excluded.created, result=excluded.result
+'''
+READ_RESEARCH_SQL = '''
+    SELECT result FROM research_cache
+    WHERE tool = ? AND key = ? AND bucket = ? AND created >= ?
+'''
+READ_RESEARCH_CANDIDATES_SQL = '''
+    SELECT key, words, result FROM research_cache
+    WHERE tool = ? AND bucket = ? AND created >= ?
+    ORDER BY created DESC
+    LIMIT ?
+'''
+WRITE_NOTIFICATION_SQL = '''
+    INSERT INTO notifications (name, message, created, next_attempt)
+    VALUES (?, ?, ?, ?)
+'''
+READ_DUE_NOTIFICATIONS_SQL = '''
+    SELECT id, name, message, created FROM notifications
+    WHERE status = 'pending' AND next_attempt <= ?
+    ORDER BY id
+    LIMIT ?
+'''
+RETRY_NOTIFICATIONS_SQL = '''
+    UPDATE notifications
+    SET attempts = attempts + 1, next_attempt = ?, error = ?,
+        status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+    WHERE id IN (SELECT value FROM json_each(?))
+'''
+READ_PRICES_SQL = '''
+    SELECT symbol, price, fetched_at FROM prices
+    WHERE symbol IN (SELECT value FROM json_each(?))
+'''
+
+
+def _replace_account(conn: sqlite3.Connection, account_dict: dict) -> None:
+    name = account_dict["name"].lower()
+    if "net_invested" in account_dict:
+        net_invested, cost_basis = account_dict["net_invested"], account_dict["cost_basis"]
+    else:
+        net_invested, cost_basis = _derive_valuation(account_dict["transactions"])
+    conn.execute(WRITE_ACCOUNT_SQL, (name, account_dict["balance"], account_dict["strategy"], net_invested))
+    for table in ("holdings", "transactions", "portfolio_series"):
+        conn.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+    conn.executemany(
+        WRITE_HOLDING_SQL,
+        [
+            (name, symbol, quantity, cost_basis.get(symbol, 0.0))
+            for symbol, quantity in account_dict["holdings"].items()
+        ],
+    )
+    conn.executemany(
+        WRITE_TRANSACTION_SQL,
+        [
+            (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"])
+            for t in account_dict["transactions"]
+        ],
+    )
+    for timestamp, value in account_dict.get("portfolio_value_time_series", []):
+        _record_value(conn, name, timestamp, value)
+
+
+with transaction() as conn:
+    _migrate_account_blobs(conn)
+    _create_account_tables(conn)
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
@@ -20,82 +439,472 @@ with sqlite3.connect(DB) as conn:
             message TEXT
         )
     ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_rollups (
+            name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (name, day, type)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS clock (id INTEGER PRIMARY KEY CHECK (id = 0), now TEXT NOT NULL)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prices (
+            symbol TEXT PRIMARY KEY,
+            price REAL NOT NULL,
+            fetched_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            type TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            trigger_price REAL NOT NULL,
+            rationale TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'open',
+            created TEXT NOT NULL,
+            updated TEXT NOT NULL,
+            message TEXT NOT NULL DEFAULT ''
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_name ON orders (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL,
+            sent REAL,
+            error TEXT NOT NULL DEFAULT ''
+        )
+    ''')
+    # The sender only ever looks for pending notifications, so index just those
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_pending ON notifications (id) WHERE status = 'pending'")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS research_cache (
+            tool TEXT NOT NULL,
+            key TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            words TEXT NOT NULL,
+            created REAL NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (tool, key, bucket)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_research_cache_bucket ON research_cache (tool, bucket, created)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS span_metrics (
+            hour TEXT NOT NULL,
+            trader TEXT NOT NULL,
+            model TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            label TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            total_seconds REAL NOT NULL,
+            max_seconds REAL NOT NULL,
+            input_tokens INTEGER NOT NULL,
+            output_tokens INTEGER NOT NULL,
+            histogram TEXT NOT NULL,
+            PRIMARY KEY (hour, trader, model, kind, label)
+        ) WITHOUT ROWID
+    ''')
+    # The matching sweep only ever reads open orders, so index just those
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_open ON orders (id) WHERE status = 'open'")
+
 
 def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
+    """
+    Replace everything stored for an account: its row, holdings, transactions and portfolio series.
+    Use this for creating or resetting an account; day-to-day changes use the narrower writers below.
+    Any open orders are cancelled, so none left over from before a reset can fill against the new account.
+    """
+    with transaction() as conn:
+        _replace_account(conn, {**account_dict, "name": name})
+        conn.execute(CANCEL_OPEN_ORDERS_SQL, (name.lower(),))
+
+def write_account_state(name: str, balance: float, strategy: str) -> None:
+    with transaction() as conn:
+        conn.execute(WRITE_ACCOUNT_STATE_SQL, (name.lower(), balance, strategy))
+
+def write_strategy(name: str, strategy: str) -> None:
+    with transaction() as conn:
+        conn.execute(WRITE_STRATEGY_SQL, (strategy, name.lower()))
+
+def write_trade(
+    name: str,
+    balance: float,
+    net_invested: float,
+    symbol: str,
+    holding: int,
+    cost_basis: float,
+    transaction_dict: dict,
+) -> None:
+    """
+    Record a single buy or sell: the new cash balance and net invested, the new quantity held
+    and cost basis of the symbol, and one appended transaction row, all in one transaction.
+    Callers compute the new values from state read in the same transaction, so no update is lost.
+    """
+    name = name.lower()
+    t = transaction_dict
+    with transaction() as conn:
+        conn.execute(WRITE_TRADE_SQL, (balance, net_invested, name))
+        if holding:
+            conn.execute(WRITE_HOLDING_SQL, (name, symbol, holding, cost_basis))
+        else:
+            conn.execute(DELETE_HOLDING_SQL, (name, symbol))
+        conn.execute(
+            WRITE_TRANSACTION_SQL,
+            (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"]),
+        )
+
+def write_portfolio_value(name: str, timestamp: str, value: float) -> None:
+    with transaction() as conn:
+        _record_value(conn, name.lower(), timestamp, value)
+
+def read_portfolio_series(
+    name: str, start: str | None = None, end: str | None = None, max_points: int = SERIES_MAX_POINTS
+) -> list[tuple[str, float]]:
+    """
+    Return (bucket, closing value) pairs for the account between start and end (inclusive timestamps,
+    defaulting to all of its history), at the finest resolution that still covers the range in at
+    most max_points buckets. Should even daily buckets be too many, every nth one is returned.
+    """
+    name = name.lower()
+    conn = get_connection()
+    first, last = conn.execute(SERIES_EXTENT_SQL, (name, "day")).fetchone()
+    if first is None:
+        return []
+    newest = conn.execute(SERIES_EXTENT_SQL, (name, "minute")).fetchone()[1] or last
+    start = start or first
+    end = end or newest
+    span = (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    for resolution, seconds, retention in SERIES_RESOLUTIONS:
+        kept_from = retention and datetime.fromisoformat(newest) - retention
+        if span / seconds <= max_points and not (kept_from and datetime.fromisoformat(start) < kept_from):
+            break
+    # Each bucket is labelled by its start, so widen the range to include the bucket holding start
+    since = _bucket(datetime.fromisoformat(start), seconds).strftime("%Y-%m-%d %H:%M:%S")
+    rows = conn.execute(READ_SERIES_SQL, (name, resolution, since, end)).fetchall()
+    if len(rows) > max_points:
+        step = -(-len(rows) // max_points)
+        rows = rows[::-1][::step][::-1]
+    return rows
+
+def read_account_state(name: str) -> dict | None:
+    """Return an account's current balance, strategy, net invested, version and holdings, without its transactions."""
+    name = name.lower()
+    conn = get_connection()
+    row = conn.execute(READ_ACCOUNT_SQL, (name,)).fetchone()
+    if not row:
+        return None
+    balance, strategy, net_invested, version = row
+    holdings = conn.execute(READ_HOLDINGS_SQL, (name,)).fetchall()
+    return {
+        "name": name,
+        "balance": balance,
+        "strategy": strategy,
+        "holdings": {symbol: quantity for symbol, quantity, _ in holdings},
+        "cost_basis": {symbol: cost_basis for symbol, _, cost_basis in holdings},
+        "net_invested": net_invested,
+        "version": version,
+    }
 
 def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
+    state = read_account_state(name)
+    if not state:
+        return None
+    transactions = get_connection().execute(READ_TRANSACTIONS_SQL, (state["name"],)).fetchall()
+    return {
+        **state,
+        "transactions": [
+            {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+            for symbol, quantity, price, timestamp, rationale in transactions
+        ],
+    }
+
+def read_recent_transactions(name: str, limit: int = 10) -> list[dict]:
+    """Return the account's last `limit` transactions, oldest first."""
+    rows = get_connection().execute(READ_RECENT_TRANSACTIONS_SQL, (name.lower(), limit)).fetchall()
+    return [
+        {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+        for symbol, quantity, price, timestamp, rationale in reversed(rows)
+    ]
+
+def read_transaction_stats(name: str) -> dict:
+    """Aggregate the account's whole trading history into a fixed-size summary."""
+    count, buys, sells, bought, sold, first, last = get_connection().execute(
+        TRANSACTION_STATS_SQL, (name.lower(),)
+    ).fetchone()
+    return {
+        "transactions": count,
+        "buys": int(buys),
+        "sells": int(sells),
+        "total_bought": round(bought, 2),
+        "total_sold": round(sold, 2),
+        "first_trade": first,
+        "last_trade": last,
+    }
+
+def read_all_portfolio_series(resolution: str = "day") -> list[tuple[str, str, float, float]]:
+    """Return (name, bucket, open, close) for every account's buckets at this resolution, in time order."""
+    return get_connection().execute(READ_ALL_SERIES_SQL, (resolution,)).fetchall()
+
+def read_all_transactions() -> list[tuple[str, str, int, float]]:
+    """Return (name, symbol, quantity, price) for every transaction, grouped by account in time order."""
+    return get_connection().execute(READ_ALL_TRANSACTIONS_SQL).fetchall()
+
+def account_version(name: str) -> tuple:
+    """
+    A version of one account that changes whenever it trades, is reset, changes strategy or records a
+    portfolio value. It reads a handful of index entries, so it is cheap enough to check on every refresh.
+    """
+    return get_connection().execute(ACCOUNT_VERSION_SQL, {"name": name.lower()}).fetchone()
+
+def analytics_version() -> tuple:
+    """
+    A version of the portfolio series and transaction data that changes whenever a value or trade is
+    recorded or an account is reset. Log writes don't change it, so results derived from these tables
+    can be cached against it.
+    """
+    return get_connection().execute(ANALYTICS_VERSION_SQL).fetchone()
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
-    
+
     Args:
         name (str): The name associated with the log
         type (str): The type of log entry
         message (str): The log message
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO logs (name, datetime, type, message)
-            VALUES (?, datetime('now'), ?, ?)
-        ''', (name.lower(), type, message))
-        conn.commit()
+    with transaction() as conn:
+        conn.execute(WRITE_LOG_SQL, (name.lower(), type, message))
+
+def write_logs(rows: list[tuple[str, str, str, str]]) -> None:
+    """
+    Write a batch of log entries in a single transaction.
+
+    Args:
+        rows (list): Tuples of (name, datetime, type, message), with the datetime in UTC
+            formatted as '%Y-%m-%d %H:%M:%S' to match the rows written by write_log
+    """
+    with transaction() as conn:
+        conn.executemany(WRITE_LOGS_SQL, [(name.lower(), dt, type, message) for name, dt, type, message in rows])
 
 def read_log(name: str, last_n=10):
     """
     Read the most recent log entries for a given name.
-    
+
     Args:
         name (str): The name to retrieve logs for
         last_n (int): Number of most recent entries to retrieve
-        
+
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    rows = get_connection().execute(READ_LOG_SQL, (name.lower(), last_n)).fetchall()
+    return reversed(rows)
+
+def read_log_since(name: str, after_id: int = 0, limit: int = 100) -> list[tuple[int, str, str, str]]:
+    """
+    Read log entries newer than a cursor, oldest first, using the (name, id) index.
+
+    Args:
+        name (str): The name to retrieve logs for
+        after_id (int): The id of the last entry already seen; 0 for the start of the log
+        limit (int): Maximum number of entries to return
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message); pass the last id back in
+    """
+    return get_connection().execute(READ_LOG_SINCE_SQL, (name.lower(), after_id, limit)).fetchall()
+
+def read_log_before(name: str, before_id: int | None = None, limit: int = 100) -> list[tuple[int, str, str, str]]:
+    """
+    Read a page of log entries older than a cursor, newest first, using the (name, id) index.
+
+    Args:
+        name (str): The name to retrieve logs for
+        before_id (int | None): The id of the oldest entry already seen; None for the latest page
+        limit (int): Maximum number of entries to return
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message)
+    """
+    cursor = before_id if before_id is not None else 2**63 - 1
+    return get_connection().execute(READ_LOG_BEFORE_SQL, (name.lower(), cursor, limit)).fetchall()
+
+def read_all_logs_since(after_id: int, limit: int = 1000) -> list[tuple[int, str, str, str, str]]:
+    """
+    Read log entries for every name newer than a cursor, oldest first, as (id, name, datetime, type, message).
+    """
+    return get_connection().execute(READ_ALL_LOGS_SINCE_SQL, (after_id, limit)).fetchall()
+
+def latest_log_id() -> int:
+    return get_connection().execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+
+def data_version() -> int:
+    """
+    Return SQLite's data_version for this thread's connection. It changes whenever another
+    connection commits, and checking it reads no tables, so it is a cheap change feed.
+    """
+    return get_connection().execute("PRAGMA data_version").fetchone()[0]
+
+def prune_logs(keep_days: int = LOG_RETENTION_DAYS) -> int:
+    """
+    Roll log entries older than keep_days up into daily per-type counts in log_rollups,
+    then delete them, so the logs table stays bounded.
+
+    Returns:
+        int: The number of log entries removed
+    """
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT id FROM logs WHERE datetime >= datetime('now', ?) ORDER BY id LIMIT 1",
+            (f"-{keep_days} days",),
+        ).fetchone()
+        cutoff_id = row[0] if row else conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM logs").fetchone()[0]
+        conn.execute(ROLLUP_LOGS_SQL, (cutoff_id,))
+        return conn.execute("DELETE FROM logs WHERE id < ?", (cutoff_id,)).rowcount
 
 def write_market(date: str, data: dict) -> None:
     data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
+    with transaction() as conn:
+        conn.execute(WRITE_MARKET_SQL, (date, data_json))
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    row = get_connection().execute(READ_MARKET_SQL, (date,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def write_prices(prices: dict[str, float], fetched_at: float) -> None:
+    """Store fetched share prices with the epoch time they were fetched, keeping whichever is newer."""
+    with transaction() as conn:
+        conn.executemany(WRITE_PRICE_SQL, [(symbol, price, fetched_at) for symbol, price in prices.items()])
+
+def read_prices(symbols: list[str]) -> dict[str, tuple[float, float]]:
+    """Return {symbol: (price, fetched_at)} for the symbols that have a stored price."""
+    rows = get_connection().execute(READ_PRICES_SQL, (json.dumps(symbols),)).fetchall()
+    return {symbol: (price, fetched_at) for symbol, price, fetched_at in rows}
+
+def write_notification(name: str, message: str, created: float) -> int:
+    """Queue a push notification for the sender; returns its id."""
+    with transaction() as conn:
+        return conn.execute(WRITE_NOTIFICATION_SQL, (name.lower(), message, created, created)).lastrowid
+
+def read_due_notifications(now: float, limit: int = 100) -> list[tuple[int, str, str, float]]:
+    """Pending notifications due to be sent by now, oldest first, as (id, name, message, created)."""
+    return get_connection().execute(READ_DUE_NOTIFICATIONS_SQL, (now, limit)).fetchall()
+
+def mark_notifications_sent(ids: list[int], now: float) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE notifications SET status = 'sent', sent = ? WHERE id IN (SELECT value FROM json_each(?))",
+            (now, json.dumps(ids)),
+        )
+
+def retry_notifications(ids: list[int], next_attempt: float, error: str, max_attempts: int) -> None:
+    """Count a failed attempt to send these notifications; after max_attempts they are marked failed."""
+    with transaction() as conn:
+        conn.execute(RETRY_NOTIFICATIONS_SQL, (next_attempt, error, max_attempts, json.dumps(ids)))
+
+def write_research(tool: str, key: str, bucket: int, words: str, created: float, result: str) -> None:
+    with transaction() as conn:
+        conn.execute(WRITE_RESEARCH_SQL, (tool, key, bucket, words, created, result))
+
+def read_research(tool: str, key: str, bucket: int, created_after: float) -> str | None:
+    row = get_connection().execute(READ_RESEARCH_SQL, (tool, key, bucket, created_after)).fetchone()
+    return row[0] if row else None
+
+def read_research_candidates(tool: str, bucket: int, created_after: float, limit: int = 200) -> list[tuple[str, str, str]]:
+    """The tool's most recent unexpired results in this time bucket, as (key, words, result)."""
+    return get_connection().execute(READ_RESEARCH_CANDIDATES_SQL, (tool, bucket, created_after, limit)).fetchall()
+
+def prune_research(created_before: float) -> int:
+    with transaction() as conn:
+        return conn.execute("DELETE FROM research_cache WHERE created < ?", (created_before,)).rowcount
+
+def write_order(
+    name: str, symbol: str, side: str, type: str, quantity: int, trigger_price: float, rationale: str, now: str
+) -> int:
+    """Store a new open order and return its id."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            WRITE_ORDER_SQL, (name.lower(), symbol, side, type, quantity, trigger_price, rationale, now, now)
+        )
+        return cursor.lastrowid
+
+def read_orders(name: str, status: str | None = None, limit: int = 50) -> list[dict]:
+    """Return an account's most recent orders, newest first, optionally only those with this status."""
+    columns = ["id", "symbol", "side", "type", "quantity", "trigger_price", "rationale", "status", "created", "updated", "message"]
+    rows = get_connection().execute(READ_ORDERS_SQL, (name.lower(), status, status, limit)).fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+def read_open_orders() -> list[tuple[int, str, str, str, str, int, float, str]]:
+    """Return (id, name, symbol, side, type, quantity, trigger_price, rationale) for every open order, oldest first."""
+    return get_connection().execute(READ_OPEN_ORDERS_SQL).fetchall()
+
+def close_order(order_id: int, status: str, now: str, message: str = "", name: str | None = None) -> bool:
+    """
+    Move an open order to a final status ('filled', 'cancelled' or 'rejected'). Returns False if it was
+    no longer open, so only one caller can ever close an order. With a name, only that account's order is closed.
+    """
+    with transaction() as conn:
+        if name is not None:
+            owner = conn.execute("SELECT name FROM orders WHERE id = ?", (order_id,)).fetchone()
+            if not owner or owner[0] != name.lower():
+                return False
+        return conn.execute(CLOSE_ORDER_SQL, (status, now, message, order_id)).rowcount == 1
+
+def merge_span_metrics(hour: str, rows: list[tuple]) -> None:
+    """
+    Add aggregated span measurements to the hour's totals. Each row is (trader, model, kind, label,
+    count, errors, total_seconds, max_seconds, input_tokens, output_tokens, histogram), where the
+    histogram is a list of counts per duration bucket, merged bucket by bucket.
+    """
+    with transaction() as conn:
+        for trader, model, kind, label, count, errors, total, longest, input_tokens, output_tokens, histogram in rows:
+            key = (hour, trader, model, kind, label)
+            existing = conn.execute(READ_SPAN_METRIC_SQL, key).fetchone()
+            if existing:
+                count += existing[0]
+                errors += existing[1]
+                total += existing[2]
+                longest = max(longest, existing[3])
+                input_tokens += existing[4]
+                output_tokens += existing[5]
+                histogram = [a + b for a, b in zip(histogram, json.loads(existing[6]))]
+            conn.execute(
+                WRITE_SPAN_METRIC_SQL,
+                (*key, count, errors, total, longest, input_tokens, output_tokens, json.dumps(histogram)),
+            )
+
+def read_span_metrics(since_hour: str = "") -> list[tuple]:
+    """Hourly span metrics from since_hour on, as (hour, trader, model, kind, label, count, errors,
+    total_seconds, max_seconds, input_tokens, output_tokens, histogram) with the histogram decoded."""
+    rows = get_connection().execute(READ_SPAN_METRICS_SQL, (since_hour,)).fetchall()
+    return [(*row[:-1], json.loads(row[-1])) for row in rows]
+
+def prune_span_metrics(keep_days: int = METRICS_RETENTION_DAYS) -> int:
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=keep_days)).strftime("%Y-%m-%d %H:00")
+    with transaction() as conn:
+        return conn.execute("DELETE FROM span_metrics WHERE hour < ?", (cutoff,)).rowcount
+
+def write_clock(now: str) -> None:
+    """Set the simulated time shared by every process using this database."""
+    with transaction() as conn:
+        conn.execute("INSERT INTO clock (id, now) VALUES (0, ?) ON CONFLICT(id) DO UPDATE SET now=excluded.now", (now,))
+
+def read_clock() -> str | None:
+    row = get_connection().execute("SELECT now FROM clock WHERE id = 0").fetchone()
+    return row[0] if row else None
@@ -0,0 +1,299 @@
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+import database
+
+load_dotenv(override=True)
+
+MEMORY_DB = os.getenv("MEMORY_DB", "memory/knowledge.db")
+SEARCH_LIMIT = 10
+GRAPH_LIMIT = 50
+
+
+class Entity(BaseModel):
+    name: str = Field(description="The name of the entity, such as a company, stock, website or market theme")
+    entityType: str = Field(description="The type of the entity, such as company, stock, website or market_condition")
+    observations: list[str] = Field(default=[], description="Facts about the entity")
+
+
+class Relation(BaseModel):
+    source: str = Field(description="The name of the entity the relation starts from")
+    target: str = Field(description="The name of the entity the relation points to")
+    relationType: str = Field(description="The relation in active voice, such as competes_with or supplies")
+
+
+class Observations(BaseModel):
+    entityName: str = Field(description="The name of an existing entity")
+    contents: list[str] = Field(description="New facts about the entity")
+
+
+def get_connection() -> sqlite3.Connection:
+    """The pooled connection to the knowledge graph for this thread; WAL lets every trader's lookups read while one writes."""
+    return database.get_connection(MEMORY_DB)
+
+
+def transaction():
+    return database.transaction(path=MEMORY_DB)
+
+
+def _create_tables(conn: sqlite3.Connection) -> None:
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS entities (
+            id INTEGER PRIMARY KEY,
+            namespace TEXT NOT NULL,
+            name TEXT NOT NULL,
+            entity_type TEXT NOT NULL,
+            updated TEXT NOT NULL,
+            UNIQUE (namespace, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_entities_name ON entities (name);
+        CREATE INDEX IF NOT EXISTS idx_entities_updated ON entities (updated);
+        CREATE TABLE IF NOT EXISTS observations (
+            id INTEGER PRIMARY KEY,
+            entity_id INTEGER NOT NULL REFERENCES entities (id) ON DELETE CASCADE,
+            content TEXT NOT NULL,
+            UNIQUE (entity_id, content)
+        );
+        CREATE TABLE IF NOT EXISTS relations (
+            source_id INTEGER NOT NULL REFERENCES entities (id) ON DELETE CASCADE,
+            target_id INTEGER NOT NULL REFERENCES entities (id) ON DELETE CASCADE,
+            relation_type TEXT NOT NULL,
+            PRIMARY KEY (source_id, target_id, relation_type)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_relations_target ON relations (target_id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS entities_fts USING fts5(
+            name, entity_type, observations, tokenize = 'porter unicode61'
+        );
+    ''')
+
+
+_create_tables(get_connection())
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _reindex(conn: sqlite3.Connection, entity_id: int) -> None:
+    """Refresh the entity's full-text row, which indexes its name, type and every observation together."""
+    conn.execute("DELETE FROM entities_fts WHERE rowid = ?", (entity_id,))
+    row = conn.execute("SELECT name, entity_type FROM entities WHERE id = ?", (entity_id,)).fetchone()
+    if row:
+        observations = [content for (content,) in conn.execute(
+            "SELECT content FROM observations WHERE entity_id = ? ORDER BY id", (entity_id,)
+        )]
+        conn.execute(
+            "INSERT INTO entities_fts (rowid, name, entity_type, observations) VALUES (?, ?, ?, ?)",
+            (entity_id, row[0], row[1], "\n".join(observations)),
+        )
+
+
+def _entity_id(conn: sqlite3.Connection, namespace: str, name: str) -> int | None:
+    row = conn.execute("SELECT id FROM entities WHERE namespace = ? AND name = ?", (namespace.lower(), name)).fetchone()
+    return row[0] if row else None
+
+
+def _namespace(namespace: str) -> str:
+    """The namespace a trader writes to; every write needs one, so traders can only change their own entities."""
+    namespace = (namespace or "").strip().lower()
+    if not namespace:
+        raise ValueError("A namespace is required; use your trader's name")
+    return namespace
+
+
+def create_entities(namespace: str, entities: list[Entity]) -> list[str]:
+    """Create entities in this namespace, or add the observations to any that already exist. Returns their names."""
+    namespace = _namespace(namespace)
+    now = _now()
+    with transaction() as conn:
+        for entity in entities:
+            conn.execute(
+                '''INSERT INTO entities (namespace, name, entity_type, updated) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(namespace, name) DO UPDATE SET entity_type = excluded.entity_type, updated = excluded.updated''',
+                (namespace, entity.name, entity.entityType, now),
+            )
+            entity_id = _entity_id(conn, namespace, entity.name)
+            conn.executemany(
+                "INSERT OR IGNORE INTO observations (entity_id, content) VALUES (?, ?)",
+                [(entity_id, content) for content in entity.observations],
+            )
+            _reindex(conn, entity_id)
+    return [entity.name for entity in entities]
+
+
+def add_observations(namespace: str, observations: list[Observations]) -> list[str]:
+    """Add facts to this namespace's existing entities."""
+    namespace = _namespace(namespace)
+    now = _now()
+    with transaction() as conn:
+        for observation in observations:
+            entity_id = _entity_id(conn, namespace, observation.entityName)
+            if entity_id is None:
+                raise ValueError(f"You have no entity named {observation.entityName}; create it first")
+            conn.executemany(
+                "INSERT OR IGNORE INTO observations (entity_id, content) VALUES (?, ?)",
+                [(entity_id, content) for content in observation.contents],
+            )
+            conn.execute("UPDATE entities SET updated = ? WHERE id = ?", (now, entity_id))
+            _reindex(conn, entity_id)
+    return [observation.entityName for observation in observations]
+
+
+def create_relations(namespace: str, relations: list[Relation]) -> int:
+    """Relate this namespace's entities by name, creating any it doesn't have yet. Returns the number added."""
+    namespace = _namespace(namespace)
+    now = _now()
+    added = 0
+    with transaction() as conn:
+        for relation in relations:
+            ids = []
+            for name in (relation.source, relation.target):
+                entity_id = _entity_id(conn, namespace, name)
+                if entity_id is None:
+                    entity_id = conn.execute(
+                        "INSERT INTO entities (namespace, name, entity_type, updated) VALUES (?, ?, 'unknown', ?)",
+                        (namespace, name, now),
+                    ).lastrowid
+                    _reindex(conn, entity_id)
+                ids.append(entity_id)
+            added += conn.execute(
+                "INSERT OR IGNORE INTO relations (source_id, target_id, relation_type) VALUES (?, ?, ?)",
+                (*ids, relation.relationType),
+            ).rowcount
+    return added
+
+
+def delete_entity(namespace: str, name: str) -> bool:
+    """Delete one of this namespace's entities with its observations and relations."""
+    namespace = _namespace(namespace)
+    with transaction() as conn:
+        entity_id = _entity_id(conn, namespace, name)
+        if entity_id is None:
+            return False
+        conn.execute("DELETE FROM entities WHERE id = ?", (entity_id,))
+        conn.execute("DELETE FROM entities_fts WHERE rowid = ?", (entity_id,))
+    return True
+
+
+def delete_relation(namespace: str, source: str, target: str, relation_type: str) -> bool:
+    """Delete a relation between two of this namespace's entities."""
+    namespace = _namespace(namespace)
+    with transaction() as conn:
+        source_id, target_id = _entity_id(conn, namespace, source), _entity_id(conn, namespace, target)
+        return conn.execute(
+            "DELETE FROM relations WHERE source_id = ? AND target_id = ? AND relation_type = ?",
+            (source_id, target_id, relation_type),
+        ).rowcount > 0
+
+
+def _graph(conn: sqlite3.Connection, entity_ids: list[int]) -> dict:
+    """The entities with their observations, and the relations between them, in the order given."""
+    if not entity_ids:
+        return {"entities": [], "relations": []}
+    placeholders = ",".join("?" * len(entity_ids))
+    rows = conn.execute(
+        f"SELECT id, namespace, name, entity_type, updated FROM entities WHERE id IN ({placeholders})", entity_ids
+    ).fetchall()
+    observations = {}
+    for entity_id, content in conn.execute(
+        f"SELECT entity_id, content FROM observations WHERE entity_id IN ({placeholders}) ORDER BY id", entity_ids
+    ):
+        observations.setdefault(entity_id, []).append(content)
+    by_id = {
+        entity_id: {"name": name, "entityType": entity_type, "namespace": namespace, "updated": updated,
+                    "observations": observations.get(entity_id, [])}
+        for entity_id, namespace, name, entity_type, updated in rows
+    }
+    relations = conn.execute(
+        f'''SELECT s.name, t.name, r.relation_type FROM relations r
+            JOIN entities s ON s.id = r.source_id JOIN entities t ON t.id = r.target_id
+            WHERE r.source_id IN ({placeholders}) OR r.target_id IN ({placeholders})''',
+        entity_ids + entity_ids,
+    ).fetchall()
+    return {
+        "entities": [by_id[entity_id] for entity_id in entity_ids if entity_id in by_id],
+        "relations": [{"source": source, "target": target, "relationType": type} for source, target, type in relations],
+    }
+
+
+def fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching any of its words, so punctuation can't break the syntax."""
+    words = re.findall(r"\w+", query)
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+def search_nodes(query: str, namespace: str | None = None, limit: int = SEARCH_LIMIT) -> dict:
+    """The best matches for the query across names, types and observations, ranked by BM25, with their relations."""
+    match = fts_query(query)
+    if not match:
+        return {"entities": [], "relations": []}
+    conn = get_connection()
+    rows = conn.execute(
+        '''SELECT e.id FROM entities_fts f JOIN entities e ON e.id = f.rowid
+           WHERE entities_fts MATCH ? AND (? IS NULL OR e.namespace = ?)
+           ORDER BY bm25(entities_fts, 10.0, 2.0, 1.0)
+           LIMIT ?''',
+        (match, namespace and namespace.lower(), namespace and namespace.lower(), limit),
+    ).fetchall()
+    return _graph(conn, [entity_id for (entity_id,) in rows])
+
+
+def open_nodes(names: list[str], namespace: str | None = None) -> dict:
+    if not names:
+        return {"entities": [], "relations": []}
+    conn = get_connection()
+    placeholders = ",".join("?" * len(names))
+    rows = conn.execute(
+        f"SELECT id FROM entities WHERE name IN ({placeholders}) AND (? IS NULL OR namespace = ?) ORDER BY updated DESC",
+        (*names, namespace and namespace.lower(), namespace and namespace.lower()),
+    ).fetchall()
+    return _graph(conn, [entity_id for (entity_id,) in rows])
+
+
+def read_graph(namespace: str | None = None, limit: int = GRAPH_LIMIT) -> dict:
+    """The most recently updated entities, so the result stays a bounded size however much is remembered."""
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT id FROM entities WHERE (? IS NULL OR namespace = ?) ORDER BY updated DESC LIMIT ?",
+        (namespace and namespace.lower(), namespace and namespace.lower(), limit),
+    ).fetchall()
+    return _graph(conn, [entity_id for (entity_id,) in rows])
+
+
+def import_legacy_memories(directory: str = "memory") -> int:
+    """
+    Import the per-trader databases written by the mcp-memory-libsql server, memory/{name}.db, into the
+    shared graph under each trader's namespace, then rename them so they are imported only once.
+    Returns the number of entities imported.
+    """
+    imported = 0
+    shared = os.path.abspath(MEMORY_DB)
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, filename)
+        if not filename.endswith(".db") or os.path.abspath(path) == shared:
+            continue
+        namespace = filename[:-3]
+        legacy = sqlite3.connect(path)
+        try:
+            entities = legacy.execute("SELECT name, entity_type FROM entities").fetchall()
+            observations = legacy.execute("SELECT entity_name, content FROM observations").fetchall()
+            relations = legacy.execute("SELECT source, target, relation_type FROM relations").fetchall()
+        except sqlite3.Error:
+            continue
+        finally:
+            legacy.close()
+        facts = {}
+        for entity_name, content in observations:
+            facts.setdefault(entity_name, []).append(content)
+        create_entities(namespace, [
+            Entity(name=name, entityType=entity_type, observations=facts.get(name, [])) for name, entity_type in entities
+        ])
+        create_relations(namespace, [
+            Relation(source=source, target=target, relationType=relation_type) for source, target, relation_type in relations
+        ])
+        os.replace(path, f"{path}.imported")
+        imported += len(entities)
+    return imported
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+load_dotenv(override=True)
+
+# off: call the provider as normal
+# record: call the provider and save every successful response
+# replay: answer only from saved responses, never touching the network; a request that differs from a
+#   recorded one only in its timestamps and prices, such as the next run of a live floor, is answered too
+# auto: replay when a response is saved, otherwise call the provider and record it
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off").strip().lower()
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "llm_cache")
+
+# Headers that describe the wire encoding rather than the body we save
+TRANSPORT_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# The parts of a prompt that change from run to run: the current time and live prices and valuations
+VOLATILE_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?")
+VOLATILE_NUMBER = re.compile(r"-?\d+\.\d+")
+
+
+class LLMCacheMiss(RuntimeError):
+    pass
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"LLM cache ({LLM_CACHE_MODE}): {self.hits} hits, {self.misses} misses, "
+            f"{self.recorded} recorded, {self.hit_rate:.0%} hit rate"
+        )
+
+
+stats = CacheStats()
+
+
+def request_key(request: httpx.Request, loose: bool = False) -> str:
+    """
+    The content address of a request: its method, URL and JSON body with keys sorted.
+    Headers are left out, so API keys and per-attempt headers don't change the address.
+    A loose key also masks timestamps and decimal numbers, so that the same prompt asked at another
+    time or against other prices has the same loose key.
+    """
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    if loose:
+        text = VOLATILE_TIMESTAMP.sub("<time>", body.decode(errors="replace"))
+        body = VOLATILE_NUMBER.sub("<number>", text).encode()
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.url}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class RecordReplayTransport(httpx.AsyncBaseTransport):
+    """
+    An httpx transport that saves each request and response as a JSON file named by the request's
+    content address, and answers repeated requests from those files. Only successful responses are
+    saved, so errors and rate limits are retried against the provider next time.
+    Each response is also filed under the request's loose key. Replay mode falls back to that when there
+    is no exact match, so a live floor run, whose prompts carry the time and live prices, can be replayed
+    offline. Auto mode only uses exact matches, so a backtest never answers one day with another's response.
+    """
+
+    def __init__(self, mode: str = LLM_CACHE_MODE, directory: str = LLM_CACHE_DIR, transport: httpx.AsyncBaseTransport | None = None):
+        self.mode = mode
+        self.directory = directory
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    def _path(self, key: str, loose: bool = False) -> str:
+        return os.path.join(self.directory, "loose" if loose else "", key[:2], f"{key}.json")
+
+    def _load(self, request: httpx.Request, path: str) -> httpx.Response | None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+        response = saved["response"]
+        return httpx.Response(
+            response["status_code"],
+            headers=response["headers"],
+            content=response["body"].encode(),
+            request=request,
+        )
+
+    def _save(self, request: httpx.Request, response: httpx.Response, body: bytes, paths: list[str]) -> None:
+        saved = {
+            "request": {"method": request.method, "url": str(request.url), "body": request.content.decode()},
+            "response": {
+                "status_code": response.status_code,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() not in TRANSPORT_HEADERS},
+                "body": body.decode(),
+            },
+        }
+        for path in paths:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so concurrent traders never read a half-written file
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(saved, f, indent=2)
+            os.replace(temporary, path)
+        stats.recorded += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = self._path(request_key(request))
+        loose_path = self._path(request_key(request, loose=True), loose=True)
+        if self.mode in ("replay", "auto"):
+            response = self._load(request, path)
+            if response is None and self.mode == "replay":
+                response = self._load(request, loose_path)
+            if response is not None:
+                stats.hits += 1
+                return response
+        stats.misses += 1
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded response for {request.method} {request.url} in {self.directory}")
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        await response.aclose()
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in TRANSPORT_HEADERS]
+        replayable = httpx.Response(response.status_code, headers=headers, content=body, request=request)
+        if response.status_code < 400:
+            self._save(request, replayable, body, [path, loose_path])
+        return replayable
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def enabled() -> bool:
+    return LLM_CACHE_MODE in ("record", "replay", "auto")
+
+
+def openai_client(base_url: str | None = None, api_key: str | None = None) -> AsyncOpenAI:
+    """An AsyncOpenAI client whose requests go through the record/replay cache when it's enabled."""
+    if not enabled():
+        return AsyncOpenAI(base_url=base_url, api_key=api_key)
+    # Replays never reach the provider, so they can run without its API key
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key or "replay",
+        http_client=DefaultAsyncHttpxClient(transport=RecordReplayTransport()),
+    )
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+from database import read_all_logs_since, latest_log_id, data_version
+
+LOG_FEED_POLL_SECONDS = float(os.getenv("LOG_FEED_POLL_SECONDS", "0.25"))
+LOG_FEED_BATCH = 1000
+
+
+class Subscription:
+    """An async iterator of lists of (id, datetime, type, message) pushed for one trader's name."""
+
+    def __init__(self, feed, name: str):
+        self.feed = feed
+        self.name = name
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.feed.unsubscribe(self)
+
+
+class LogFeed:
+    """
+    In-process pub/sub for new log entries.
+    A single watcher thread checks SQLite's data_version, which costs no table reads, and only
+    queries the logs table when another connection has committed. New rows are pushed to the
+    asyncio queues of whoever subscribed to that trader's name.
+    """
+
+    def __init__(self, poll_interval: float = LOG_FEED_POLL_SECONDS):
+        self.poll_interval = poll_interval
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._last_id = latest_log_id()
+                self._thread = threading.Thread(target=self._run, name="log-feed", daemon=True)
+                self._thread.start()
+
+    def _publish(self, rows) -> None:
+        by_name = defaultdict(list)
+        for id, name, timestamp, type, message in rows:
+            by_name[name].append((id, timestamp, type, message))
+        with self._lock:
+            targets = [(sub, by_name[name]) for name in by_name for sub in self._subscribers.get(name, ())]
+        for subscription, entries in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, entries)
+            except RuntimeError:
+                pass
+
+    def _run(self) -> None:
+        version = None
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                current = data_version()
+                if current == version:
+                    continue
+                version = current
+                while rows := read_all_logs_since(self._last_id, LOG_FEED_BATCH):
+                    self._last_id = rows[-1][0]
+                    self._publish(rows)
+                    if len(rows) < LOG_FEED_BATCH:
+                        break
+            except Exception as e:
+                print(f"Log feed failed to read new logs: {e}")
+
+    def subscribe(self, name: str) -> Subscription:
+        """
+        Start receiving new entries for this name. Every entry committed after this call is delivered,
+        so read any backlog after subscribing and drop duplicates by id. Close the subscription when done.
+        """
+        self._ensure_started()
+        subscription = Subscription(self, name.lower())
+        with self._lock:
+            self._subscribers[subscription.name].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers[subscription.name].discard(subscription)
+
+
+log_feed = LogFeed()
@@ -2,8 +2,11 @@ from polygon import RESTClient
 from dotenv import load_dotenv
 import os
 from datetime import datetime
-import random
 from database import write_market, read_market
+from price_cache import PriceCache, PRICE_TTL_SECONDS
+from price_store import get_price_store
+from synthetic_market import get_synthetic_market
+import clock
 from functools import lru_cache
 from datetime import timezone
 
@@ -11,20 +14,40 @@ load_dotenv(override=True)
 
 polygon_api_key = os.getenv("POLYGON_API_KEY")
 polygon_plan = os.getenv("POLYGON_PLAN")
+backtest_dir = os.getenv("BACKTEST_DIR")
 
-is_paid_polygon = polygon_plan == "paid"
-is_realtime_polygon = polygon_plan == "realtime"
+# In a backtest, prices come from the local price store as of the simulated date, never from Polygon.
+# Without a Polygon key, or with SYNTHETIC_MARKET=true, they come from the seeded synthetic market.
+is_backtest = bool(backtest_dir)
+is_synthetic_market = not is_backtest and (
+    not polygon_api_key or os.getenv("SYNTHETIC_MARKET", "false").strip().lower() == "true"
+)
+is_paid_polygon = polygon_plan == "paid" and not is_backtest and not is_synthetic_market
+is_realtime_polygon = polygon_plan == "realtime" and not is_backtest and not is_synthetic_market
+price_plan = "realtime" if is_realtime_polygon else "paid" if is_paid_polygon else "eod"
+
+SNAPSHOT_CHUNK_SIZE = 250
+
+
+@lru_cache(maxsize=1)
+def get_client() -> RESTClient:
+    """One shared client, so every lookup reuses the same pooled HTTPS connections."""
+    return RESTClient(polygon_api_key)
 
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
+    if is_backtest:
+        return True
+    if is_synthetic_market:
+        return get_synthetic_market().is_market_open(clock.now())
+    client = get_client()
     market_status = client.get_market_status()
     return market_status.market == "open"
 
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
     """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+    client = get_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
@@ -42,29 +65,68 @@ def get_market_for_prior_date(today):
     return market_data
 
 
-def get_share_price_polygon_eod(symbol) -> float:
+def snapshot_price(snapshot) -> float:
+    if snapshot.min and snapshot.min.close:
+        return snapshot.min.close
+    return snapshot.prev_day.close if snapshot.prev_day and snapshot.prev_day.close else 0.0
+
+
+def get_share_prices_polygon_min(symbols: list[str]) -> dict[str, float]:
+    """Price many symbols with the all-tickers snapshot, one request per SNAPSHOT_CHUNK_SIZE symbols."""
+    client = get_client()
+    prices = dict.fromkeys(symbols, 0.0)
+    for start in range(0, len(symbols), SNAPSHOT_CHUNK_SIZE):
+        chunk = symbols[start : start + SNAPSHOT_CHUNK_SIZE]
+        for snapshot in client.get_snapshot_all("stocks", tickers=chunk):
+            prices[snapshot.ticker] = snapshot_price(snapshot)
+    return prices
+
+
+def fetch_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    if is_paid_polygon:
+        return get_share_prices_polygon_min(symbols)
     today = datetime.now().date().strftime("%Y-%m-%d")
     market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    return {symbol: market_data.get(symbol, 0.0) for symbol in symbols}
 
 
-def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
-    result = client.get_snapshot_ticker("stocks", symbol)
-    return result.min.close or result.prev_day.close
+price_cache = PriceCache(
+    fetch_share_prices_polygon,
+    ttl=float(os.getenv("PRICE_CACHE_TTL", PRICE_TTL_SECONDS[price_plan])),
+)
 
 
 def get_share_price_polygon(symbol) -> float:
-    if is_paid_polygon:
-        return get_share_price_polygon_min(symbol)
-    else:
-        return get_share_price_polygon_eod(symbol)
+    return price_cache.get_many([symbol])[symbol]
+
+
+def get_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    return price_cache.get_many(symbols)
+
+
+def get_synthetic_share_prices(symbols: list[str]) -> dict[str, float]:
+    return get_synthetic_market().prices(symbols, clock.now())
+
+
+def get_share_prices(symbols) -> dict[str, float]:
+    """Price several symbols in one market data lookup, e.g. to value a whole portfolio."""
+    symbols = list(dict.fromkeys(symbols))
+    if is_backtest:
+        return get_price_store(backtest_dir).prices_as_of(symbols, clock.now().date())
+    if not is_synthetic_market and symbols:
+        try:
+            return get_share_prices_polygon(symbols)
+        except Exception as e:
+            print(f"Was not able to use the polygon API due to {e}; using synthetic prices")
+    return get_synthetic_share_prices(symbols)
 
 
 def get_share_price(symbol) -> float:
-    if polygon_api_key:
+    if is_backtest:
+        return get_share_prices([symbol])[symbol]
+    if not is_synthetic_market:
         try:
             return get_share_price_polygon(symbol)
         except Exception as e:
-            print(f"Was not able to use the polygon API due to {e}; using a random number")
-    return float(random.randint(1, 100))
+            print(f"Was not able to use the polygon API due to {e}; using a synthetic price")
+    return get_synthetic_share_prices([symbol])[symbol]
@@ -1,5 +1,9 @@
 from mcp.server.fastmcp import FastMCP
-from market import get_share_price
+from datetime import date
+from market import get_share_price, get_share_prices, is_synthetic_market
+from synthetic_market import get_synthetic_market
+import clock
+from metrics import observe_database_writes
 
 mcp = FastMCP("market_server")
 
@@ -12,5 +16,49 @@ async def lookup_share_price(symbol: str) -> float:
     """
     return get_share_price(symbol)
 
+@mcp.tool()
+async def lookup_share_prices(symbols: list[str]) -> dict[str, float]:
+    """This tool provides the current prices of several stock symbols in a single lookup.
+    Use it instead of calling lookup_share_price repeatedly when you need more than one price.
+
+    Args:
+        symbols: the symbols of the stocks
+    """
+    return get_share_prices(symbols)
+
+# Offline, the synthetic market also stands in for the Polygon MCP server's market data tools
+
+if is_synthetic_market:
+
+    @mcp.tool()
+    async def get_snapshot_ticker(ticker: str) -> dict:
+        """Get the latest price of a stock with today's open, high and low so far and its change on the previous close.
+
+        Args:
+            ticker: the symbol of the stock
+        """
+        return get_synthetic_market().snapshot(ticker, clock.now())
+
+    @mcp.tool()
+    async def get_previous_close_agg(ticker: str) -> dict:
+        """Get the previous day's open, high, low and close for a stock.
+
+        Args:
+            ticker: the symbol of the stock
+        """
+        return get_synthetic_market().previous_close(ticker, clock.now())
+
+    @mcp.tool()
+    async def get_aggs(ticker: str, from_date: str, to_date: str) -> list[dict]:
+        """Get daily open, high, low and close bars for a stock between two dates, inclusive.
+
+        Args:
+            ticker: the symbol of the stock
+            from_date: the first date, as YYYY-MM-DD
+            to_date: the last date, as YYYY-MM-DD
+        """
+        return get_synthetic_market().daily_bars(ticker, date.fromisoformat(from_date), date.fromisoformat(to_date))
+
 if __name__ == "__main__":
+    observe_database_writes()
     mcp.run(transport='stdio')
\ No newline at end of file
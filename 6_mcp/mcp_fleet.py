@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack
+from agents.mcp import MCPServerStdio
+from mcp.types import CallToolResult
+from metrics import recorder
+from research_cache import RESEARCH_CACHE, research_cache
+from mcp_params import (
+    trader_mcp_server_params,
+    trader_mcp_server_names,
+    researcher_mcp_server_params,
+    researcher_mcp_server_names,
+)
+
+MCP_MAX_CONCURRENT_CALLS = int(os.getenv("MCP_MAX_CONCURRENT_CALLS", "4"))
+MCP_SESSION_TIMEOUT_SECONDS = 120
+# Research servers whose results are the same whichever trader asks, so they go through the research cache
+CACHED_MCP_SERVERS = {"fetch", "search"}
+
+
+class SharedMCPServerStdio(MCPServerStdio):
+    """An MCP server used by several agents at once, with a cap on how many tool calls run concurrently."""
+
+    def __init__(self, params, max_concurrent_calls: int = MCP_MAX_CONCURRENT_CALLS, **kwargs):
+        super().__init__(params, **kwargs)
+        self.call_limit = asyncio.Semaphore(max_concurrent_calls)
+
+    async def call_tool(self, tool_name, arguments):
+        async with self.call_limit:
+            return await super().call_tool(tool_name, arguments)
+
+
+class CachedMCPServerStdio(SharedMCPServerStdio):
+    """A shared research server whose tool calls are answered from the floor-wide research cache when possible."""
+
+    async def call_tool(self, tool_name, arguments):
+        return await research_cache.get_or_call(
+            f"{self.name}.{tool_name}",
+            arguments,
+            lambda: super(CachedMCPServerStdio, self).call_tool(tool_name, arguments),
+            serialize=lambda result: None if result.isError else result.model_dump_json(),
+            deserialize=CallToolResult.model_validate_json,
+        )
+
+
+class MCPFleet:
+    """
+    The MCP servers for the whole trading floor, started once and kept running across trading rounds.
+    Every server (accounts, push, market, fetch, search, memory) is shared by all the traders; memory
+    keeps each trader's knowledge in its own namespace of one shared graph.
+    Use as `async with MCPFleet(names) as fleet:` so that servers are started and stopped in the same task.
+    The servers default to those in mcp_params; pass (name, params) lists to run a different set.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        max_concurrent_calls: int = MCP_MAX_CONCURRENT_CALLS,
+        trader_server_params: list[tuple[str, dict]] | None = None,
+        researcher_server_params: list[tuple[str, dict]] | None = None,
+    ):
+        self.names = names
+        self.max_concurrent_calls = max_concurrent_calls
+        self.trader_server_params = trader_server_params or list(zip(trader_mcp_server_names, trader_mcp_server_params))
+        if researcher_server_params is None:
+            researcher_server_params = list(zip(researcher_mcp_server_names, researcher_mcp_server_params))
+        self.researcher_server_params = researcher_server_params
+        self.startup_seconds = {}
+        self.trader_servers = []
+        self.researcher_servers = []
+        self._stack = AsyncExitStack()
+
+    async def _start(self, name: str, params: dict) -> MCPServerStdio:
+        start = time.perf_counter()
+        server_class = CachedMCPServerStdio if RESEARCH_CACHE and name in CACHED_MCP_SERVERS else SharedMCPServerStdio
+        server = server_class(
+            params,
+            max_concurrent_calls=self.max_concurrent_calls,
+            name=name,
+            cache_tools_list=True,
+            client_session_timeout_seconds=MCP_SESSION_TIMEOUT_SECONDS,
+        )
+        await self._stack.enter_async_context(server)
+        self.startup_seconds[name] = time.perf_counter() - start
+        recorder.record("", "", "mcp_startup", name, self.startup_seconds[name])
+        return server
+
+    async def __aenter__(self):
+        await self._stack.__aenter__()
+        try:
+            for name, params in self.trader_server_params:
+                self.trader_servers.append(await self._start(name, params))
+            for name, params in self.researcher_server_params:
+                self.researcher_servers.append(await self._start(name, params))
+        except BaseException:
+            await self._stack.aclose()
+            raise
+        print(self.startup_report())
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._stack.__aexit__(*exc)
+
+    def startup_report(self) -> str:
+        total = sum(self.startup_seconds.values())
+        details = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.startup_seconds.items())
+        return f"Started {len(self.startup_seconds)} MCP servers in {total:.1f}s: {details}"
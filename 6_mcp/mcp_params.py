@@ -7,6 +7,14 @@ load_dotenv(override=True)
 brave_env = {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY")}
 polygon_api_key = os.getenv("POLYGON_API_KEY")
 
+# Settings that our local MCP servers must share with the process that launches them, such as
+# the database and simulated clock of a backtest; MCP only passes a minimal environment to servers
+local_env = {
+    key: os.environ[key]
+    for key in ["ACCOUNTS_DB", "BACKTEST_DIR", "SIMULATED_CLOCK", "SYNTHETIC_MARKET", "SYNTHETIC_MARKET_SEED", "MEMORY_DB"]
+    if key in os.environ
+} or None
+
 # The MCP server for the Trader to read Market Data
 
 if is_paid_polygon or is_realtime_polygon:
@@ -16,31 +24,33 @@ if is_paid_polygon or is_realtime_polygon:
         "env": {"POLYGON_API_KEY": polygon_api_key},
     }
 else:
-    market_mcp = {"command": "uv", "args": ["run", "market_server.py"]}
+    market_mcp = {"command": "uv", "args": ["run", "market_server.py"], "env": local_env}
 
 
 # The full set of MCP servers for the trader: Accounts, Push Notification and the Market
 
 trader_mcp_server_params = [
-    {"command": "uv", "args": ["run", "accounts_server.py"]},
-    {"command": "uv", "args": ["run", "push_server.py"]},
+    {"command": "uv", "args": ["run", "accounts_server.py"], "env": local_env},
+    {"command": "uv", "args": ["run", "push_server.py"], "env": local_env},
     market_mcp,
 ]
 
+trader_mcp_server_names = ["accounts", "push", "market"]
+
 # The full set of MCP servers for the researcher: Fetch, Brave Search and Memory
+# All three are shared: Memory is one knowledge graph in a single SQLite file, with a namespace per trader
+
+memory_mcp_server_params = {"command": "uv", "args": ["run", "memory_server.py"], "env": local_env}
+
+researcher_mcp_server_params = [
+    {"command": "uvx", "args": ["mcp-server-fetch"]},
+    {
+        "command": "npx",
+        "args": ["-y", "@modelcontextprotocol/server-brave-search"],
+        "env": brave_env,
+    },
+    memory_mcp_server_params,
+]
 
+researcher_mcp_server_names = ["fetch", "search", "memory"]
 
-def researcher_mcp_server_params(name: str):
-    return [
-        {"command": "uvx", "args": ["mcp-server-fetch"]},
-        {
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-brave-search"],
-            "env": brave_env,
-        },
-        {
-            "command": "npx",
-            "args": ["-y", "mcp-memory-libsql"],
-            "env": {"LIBSQL_URL": f"file:./memory/{name}.db"},
-        },
-    ]
@@ -0,0 +1,95 @@
+from mcp.server.fastmcp import FastMCP
+import knowledge
+from knowledge import Entity, Observations, Relation
+import json
+
+mcp = FastMCP("memory_server")
+
+@mcp.tool()
+async def create_entities(namespace: str, entities: list[Entity]) -> str:
+    """Store entities in the shared knowledge graph, such as companies, stocks, websites and market conditions.
+    Adding an entity that you already stored adds its new observations to it.
+
+    Args:
+        namespace: Your trader's name; the entities are stored under it, and every trader can read them
+        entities: The entities, each with a name, an entityType and a list of observations
+    """
+    names = knowledge.create_entities(namespace, entities)
+    return f"Stored {len(names)} entities: {', '.join(names)}"
+
+@mcp.tool()
+async def add_observations(namespace: str, observations: list[Observations]) -> str:
+    """Add new facts to entities you already stored in the knowledge graph.
+
+    Args:
+        namespace: Your trader's name
+        observations: For each entity, its entityName and the new contents
+    """
+    names = knowledge.add_observations(namespace, observations)
+    return f"Added observations to {', '.join(names)}"
+
+@mcp.tool()
+async def create_relations(namespace: str, relations: list[Relation]) -> str:
+    """Relate your entities in the knowledge graph, for example that one company supplies another.
+    Entities you haven't stored yet are created.
+
+    Args:
+        namespace: Your trader's name
+        relations: The relations, each with a source, a target and a relationType in active voice
+    """
+    return f"Added {knowledge.create_relations(namespace, relations)} relations"
+
+@mcp.tool()
+async def search_nodes(query: str, namespace: str | None = None) -> str:
+    """Search the knowledge graph shared by all traders for entities matching the query, best matches first.
+
+    Args:
+        query: Words to look for in entity names, types and observations
+        namespace: Only search what this trader stored; leave out to search everyone's knowledge
+    """
+    return json.dumps(knowledge.search_nodes(query, namespace))
+
+@mcp.tool()
+async def open_nodes(names: list[str], namespace: str | None = None) -> str:
+    """Retrieve entities by name with their observations and relations.
+
+    Args:
+        names: The names of the entities
+        namespace: Only return what this trader stored; leave out to include everyone's
+    """
+    return json.dumps(knowledge.open_nodes(names, namespace))
+
+@mcp.tool()
+async def read_graph(namespace: str | None = None) -> str:
+    """Read the most recently updated entities in the knowledge graph with their relations.
+
+    Args:
+        namespace: Only return what this trader stored; leave out to include everyone's
+    """
+    return json.dumps(knowledge.read_graph(namespace))
+
+@mcp.tool()
+async def delete_entity(namespace: str, name: str) -> str:
+    """Delete an entity you stored, with its observations and relations.
+
+    Args:
+        namespace: Your trader's name
+        name: The name of the entity
+    """
+    return "Deleted" if knowledge.delete_entity(namespace, name) else f"{name} is not in your namespace"
+
+@mcp.tool()
+async def delete_relation(namespace: str, source: str, target: str, relationType: str) -> str:
+    """Delete a relation between two entities you stored.
+
+    Args:
+        namespace: Your trader's name
+        source: The name of the entity the relation starts from
+        target: The name of the entity the relation points to
+        relationType: The type of the relation
+    """
+    return "Deleted" if knowledge.delete_relation(namespace, source, target, relationType) else "No such relation"
+
+if __name__ == "__main__":
+    knowledge.import_legacy_memories()
+    mcp.run(transport='stdio')
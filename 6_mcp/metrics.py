@@ -0,0 +1,329 @@
+import atexit
+import bisect
+import math
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from agents import TracingProcessor, Trace, Span
+from dotenv import load_dotenv
+import database
+from database import merge_span_metrics, read_span_metrics
+
+load_dotenv(override=True)
+
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "10"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_REPORT_HOURS = 24
+
+# Upper bounds of the duration histogram buckets in seconds, from a fast DB write to a slow model turn
+DURATION_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120, 300]
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def _hour(moment: datetime | None = None) -> str:
+    return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:00")
+
+
+class SpanStats:
+    """Count, errors, tokens and a duration histogram for one kind of span, mergeable across processes."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.histogram = [0] * (len(DURATION_BUCKETS) + 1)
+
+    def add(self, seconds: float, error: bool = False, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        self.count += 1
+        self.errors += bool(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.histogram[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+
+    def merge(self, count, errors, total_seconds, max_seconds, input_tokens, output_tokens, histogram) -> None:
+        self.count += count
+        self.errors += errors
+        self.total_seconds += total_seconds
+        self.max_seconds = max(self.max_seconds, max_seconds)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.histogram = [a + b for a, b in zip(self.histogram, histogram)]
+
+    def row(self) -> tuple:
+        return (
+            self.count, self.errors, self.total_seconds, self.max_seconds,
+            self.input_tokens, self.output_tokens, self.histogram,
+        )
+
+    def percentile(self, q: float) -> float:
+        """Estimate a percentile by interpolating within the histogram bucket it falls in."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, in_bucket in enumerate(self.histogram):
+            if in_bucket and seen + in_bucket >= rank:
+                lower = DURATION_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = DURATION_BUCKETS[i] if i < len(DURATION_BUCKETS) else self.max_seconds
+                estimate = lower + (upper - lower) * (rank - seen) / in_bucket
+                return min(estimate, self.max_seconds)
+            seen += in_bucket
+        return self.max_seconds
+
+
+class MetricsRecorder:
+    """
+    Aggregates span measurements in memory, keyed by (trader, model, kind, label), and merges them into
+    the hourly span_metrics table every METRICS_FLUSH_SECONDS from a background thread and at exit.
+    Every process on the floor, including the MCP servers, can record into the same table this way.
+    """
+
+    def __init__(self, flush_seconds: float = METRICS_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending: dict[tuple, SpanStats] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._flushing = threading.local()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def record(
+        self, trader: str, model: str, kind: str, label: str, seconds: float,
+        error: bool = False, input_tokens: int = 0, output_tokens: int = 0,
+    ) -> None:
+        self._ensure_started()
+        key = (trader.lower(), model, kind, label)
+        with self._lock:
+            stats = self._pending.setdefault(key, SpanStats())
+            stats.add(seconds, error, input_tokens, output_tokens)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._flushing.active = True
+            try:
+                merge_span_metrics(_hour(), [(*key, *stats.row()) for key, stats in pending.items()])
+            except Exception as e:
+                print(f"Metrics failed to write {len(pending)} rows: {e}")
+            finally:
+                self._flushing.active = False
+
+    def is_flushing(self) -> bool:
+        """Whether this thread is writing metrics, whose own writes must not be recorded as more metrics."""
+        return getattr(self._flushing, "active", False)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+
+recorder = MetricsRecorder()
+
+
+def observe_database_writes(process: str | None = None) -> None:
+    """Record the duration of every write transaction this process makes, labelled with the process name."""
+    label = process or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python"
+
+    def on_write(seconds: float) -> None:
+        if not recorder.is_flushing():
+            recorder.record("", "", "db_write", label, seconds)
+
+    database.on_write_transaction = on_write
+
+
+def _seconds(span: Span) -> float | None:
+    if not span.started_at or not span.ended_at:
+        return None
+    return (datetime.fromisoformat(span.ended_at) - datetime.fromisoformat(span.started_at)).total_seconds()
+
+
+class MetricsProcessor(TracingProcessor):
+    """
+    Turns finished spans into metrics: LLM generations by model with their token counts, tool and MCP
+    tool calls, MCP tool listings and whole agent turns, each attributed to the trader and model of the
+    trace they ran in. Traders pass their name and model as trace metadata.
+    """
+
+    def __init__(self, metrics: MetricsRecorder = recorder):
+        self.metrics = metrics
+        self.traces: dict[str, tuple[str, str]] = {}
+
+    def on_trace_start(self, trace: Trace) -> None:
+        metadata = getattr(trace, "metadata", None) or {}
+        self.traces[trace.trace_id] = (metadata.get("trader", ""), metadata.get("model", ""))
+
+    def on_trace_end(self, trace: Trace) -> None:
+        self.traces.pop(trace.trace_id, None)
+
+    def on_span_start(self, span: Span) -> None:
+        pass
+
+    def on_span_end(self, span: Span) -> None:
+        seconds = _seconds(span)
+        data = span.span_data
+        if seconds is None or data is None:
+            return
+        trader, model = self.traces.get(span.trace_id, ("", ""))
+        input_tokens = output_tokens = 0
+        if data.type == "generation":
+            kind, label = "generation", data.model or model
+            usage = data.usage or {}
+            input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        elif data.type == "response":
+            kind, label = "generation", getattr(data.response, "model", None) or model
+            usage = getattr(data.response, "usage", None)
+            if usage:
+                input_tokens, output_tokens = usage.input_tokens, usage.output_tokens
+        elif data.type == "function":
+            server = (data.mcp_data or {}).get("server")
+            kind, label = ("mcp_tool", f"{server}.{data.name}") if server else ("tool", data.name)
+        elif data.type == "mcp_tools":
+            kind, label = "mcp_list_tools", data.server or ""
+        elif data.type == "agent":
+            kind, label = "agent", data.name
+        else:
+            return
+        self.metrics.record(trader, model, kind, label, seconds, span.error is not None, input_tokens, output_tokens)
+
+    def force_flush(self) -> None:
+        self.metrics.flush()
+
+    def shutdown(self) -> None:
+        self.metrics.flush()
+
+
+def aggregate(hours: float | None = None) -> dict[tuple, SpanStats]:
+    """Merge the stored hourly metrics for the last `hours` hours, or all of them, per (trader, model, kind, label)."""
+    since = _hour(datetime.now(timezone.utc) - timedelta(hours=hours)) if hours else ""
+    totals: dict[tuple, SpanStats] = {}
+    for hour, trader, model, kind, label, *row in read_span_metrics(since):
+        totals.setdefault((trader, model, kind, label), SpanStats()).merge(*row)
+    return totals
+
+
+def metrics_report(hours: float | None = METRICS_REPORT_HOURS) -> list[dict]:
+    """Percentile summaries per trader, model, kind and label, slowest p90 first."""
+    report = []
+    for (trader, model, kind, label), stats in aggregate(hours).items():
+        report.append({
+            "trader": trader,
+            "model": model,
+            "kind": kind,
+            "label": label,
+            "count": stats.count,
+            "error_rate": stats.errors / stats.count,
+            "mean_seconds": stats.total_seconds / stats.count,
+            **{f"p{round(q * 100)}_seconds": stats.percentile(q) for q in PERCENTILES},
+            "max_seconds": stats.max_seconds,
+            "input_tokens": stats.input_tokens,
+            "output_tokens": stats.output_tokens,
+        })
+    return sorted(report, key=lambda row: row["p90_seconds"], reverse=True)
+
+
+METRIC_LABELS = ("trader", "model", "kind", "label")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: tuple, **extra) -> str:
+    labels = {**dict(zip(METRIC_LABELS, key)), **extra}
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def prometheus_text(hours: float | None = None) -> str:
+    """The stored metrics in the Prometheus text exposition format, over all retained history by default."""
+    totals = sorted(aggregate(hours).items())
+    lines = [
+        "# HELP trading_span_seconds Duration of trading floor spans.",
+        "# TYPE trading_span_seconds histogram",
+    ]
+    for key, stats in totals:
+        cumulative = 0
+        for bound, in_bucket in zip(DURATION_BUCKETS + ["+Inf"], stats.histogram):
+            cumulative += in_bucket
+            lines.append(f"trading_span_seconds_bucket{_labels(key, le=bound)} {cumulative}")
+        lines.append(f"trading_span_seconds_sum{_labels(key)} {stats.total_seconds}")
+        lines.append(f"trading_span_seconds_count{_labels(key)} {stats.count}")
+    lines += [
+        "# HELP trading_span_quantile_seconds Estimated span duration percentiles.",
+        "# TYPE trading_span_quantile_seconds gauge",
+    ]
+    for key, stats in totals:
+        for q in PERCENTILES:
+            lines.append(f"trading_span_quantile_seconds{_labels(key, quantile=q)} {stats.percentile(q)}")
+    lines += [
+        "# HELP trading_span_errors_total Spans that ended with an error.",
+        "# TYPE trading_span_errors_total counter",
+    ]
+    for key, stats in totals:
+        lines.append(f"trading_span_errors_total{_labels(key)} {stats.errors}")
+    lines += [
+        "# HELP trading_tokens_total Tokens used by LLM generations.",
+        "# TYPE trading_tokens_total counter",
+    ]
+    for key, stats in totals:
+        if stats.input_tokens or stats.output_tokens:
+            lines.append(f"trading_tokens_total{_labels(key, direction='input')} {stats.input_tokens}")
+            lines.append(f"trading_tokens_total{_labels(key, direction='output')} {stats.output_tokens}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics in Prometheus text format; ?hours=N limits it to the last N hours."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/metrics":
+            self.send_error(404)
+            return
+        hours = parse_qs(url.query).get("hours", [None])[0]
+        body = prometheus_text(float(hours) if hours else None).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> ThreadingHTTPServer:
+    """Serve the Prometheus endpoint from a background thread of this process."""
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Serving metrics on http://localhost:{server.server_address[1]}/metrics")
+    return server
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        server = ThreadingHTTPServer(("", METRICS_PORT or 9464), MetricsHandler)
+        print(f"Serving metrics on http://localhost:{server.server_address[1]}/metrics")
+        server.serve_forever()
+    else:
+        for row in metrics_report():
+            print(
+                f"{row['trader'] or '-':<10} {row['kind']:<14} {row['label'][:40]:<40} n={row['count']:<6} "
+                f"p50={row['p50_seconds']:.3f}s p90={row['p90_seconds']:.3f}s p99={row['p99_seconds']:.3f}s "
+                f"errors={row['error_rate']:.0%}"
+            )
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+import httpx
+from dotenv import load_dotenv
+from database import mark_notifications_sent, read_due_notifications, retry_notifications, write_notification
+
+load_dotenv(override=True)
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+PUSHOVER_MAX_MESSAGE = 1024
+PUSHOVER_TIMEOUT_SECONDS = 10
+
+# pushover, or local to write notifications to PUSH_LOCAL_FILE instead; pushover is used when configured
+PUSH_SINK = os.getenv("PUSH_SINK", "pushover" if os.getenv("PUSHOVER_TOKEN") else "local").strip().lower()
+PUSH_LOCAL_FILE = os.getenv("PUSH_LOCAL_FILE", "push_outbox.jsonl")
+PUSH_POLL_SECONDS = float(os.getenv("PUSH_POLL_SECONDS", "5"))
+# A digest goes out once no trader has queued a notification for PUSH_QUIET_SECONDS, so each trading
+# round's summaries arrive together, or once the oldest has waited PUSH_MAX_DELAY_SECONDS
+PUSH_QUIET_SECONDS = float(os.getenv("PUSH_QUIET_SECONDS", "60"))
+PUSH_MAX_DELAY_SECONDS = float(os.getenv("PUSH_MAX_DELAY_SECONDS", "600"))
+PUSH_MAX_ATTEMPTS = int(os.getenv("PUSH_MAX_ATTEMPTS", "6"))
+PUSH_BACKOFF_SECONDS = float(os.getenv("PUSH_BACKOFF_SECONDS", "15"))
+PUSH_MAX_BACKOFF_SECONDS = 30 * 60
+
+
+class PushError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class PushoverSink:
+    """Sends notifications through the Pushover API."""
+
+    def __init__(self, user: str | None = None, token: str | None = None, client: httpx.AsyncClient | None = None):
+        self.user = user or os.getenv("PUSHOVER_USER")
+        self.token = token or os.getenv("PUSHOVER_TOKEN")
+        self.client = client or httpx.AsyncClient(timeout=PUSHOVER_TIMEOUT_SECONDS)
+
+    async def send(self, title: str, message: str) -> None:
+        payload = {"user": self.user, "token": self.token, "title": title, "message": message}
+        try:
+            response = await self.client.post(PUSHOVER_URL, data=payload)
+        except httpx.HTTPError as e:
+            raise PushError(f"Pushover request failed: {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise PushError(f"Pushover returned {response.status_code}")
+        if response.status_code >= 400:
+            # Bad credentials or a malformed message won't succeed on a retry
+            raise PushError(f"Pushover rejected the notification: {response.text}", retryable=False)
+
+
+class LocalSink:
+    """Appends notifications to a JSON lines file, standing in for Pushover in tests and offline runs."""
+
+    def __init__(self, path: str = PUSH_LOCAL_FILE):
+        self.path = path
+        self.sent: list[dict] = []
+
+    async def send(self, title: str, message: str) -> None:
+        notification = {"time": datetime.now().isoformat(timespec="seconds"), "title": title, "message": message}
+        self.sent.append(notification)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(notification) + "\n")
+
+
+def make_sink(kind: str = PUSH_SINK):
+    return PushoverSink() if kind == "pushover" else LocalSink()
+
+
+def queue_push(name: str, message: str) -> int:
+    """Queue a notification to go out in the next digest; this never waits on the provider."""
+    return write_notification(name, message, time.time())
+
+
+def digest(rows: list[tuple[int, str, str, float]], limit: int = PUSHOVER_MAX_MESSAGE) -> tuple[str, str]:
+    """
+    Coalesce queued notifications into one (title, message), each prefixed with the trader's name.
+    Every trader gets an equal share of the provider's message limit, so no summary crowds out the rest.
+    """
+    title = "Trading floor" if len(rows) == 1 else f"Trading floor: {len(rows)} updates"
+    share = max(limit // len(rows) - 1, 40)
+    lines = []
+    for _, name, message, _ in rows:
+        line = f"{name.title()}: {message.strip()}" if name else message.strip()
+        lines.append(line if len(line) <= share else line[: share - 1] + "…")
+    return title, "\n".join(lines)[:limit]
+
+
+def backoff(attempts: int) -> float:
+    """Exponential backoff with jitter, so repeated failures don't retry in lockstep."""
+    delay = min(PUSH_BACKOFF_SECONDS * 2**attempts, PUSH_MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class PushSender:
+    """
+    Drains the notification queue in the background. Queued notifications are held until the burst
+    from a trading round has settled, then sent as one digest. A failed send is retried with exponential
+    backoff until PUSH_MAX_ATTEMPTS; errors the provider won't accept on a retry fail straight away.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink or make_sink()
+        self.attempts = 0
+
+    def ready(self, rows: list[tuple[int, str, str, float]], now: float) -> bool:
+        if not rows:
+            return False
+        oldest, newest = rows[0][3], max(row[3] for row in rows)
+        return now - newest >= PUSH_QUIET_SECONDS or now - oldest >= PUSH_MAX_DELAY_SECONDS
+
+    async def send_due(self, now: float | None = None, force: bool = False) -> int:
+        """Send one digest of the due notifications if they're ready. Returns the number sent."""
+        now = time.time() if now is None else now
+        rows = await asyncio.to_thread(read_due_notifications, now)
+        if not (force and rows) and not self.ready(rows, now):
+            return 0
+        ids = [row[0] for row in rows]
+        title, message = digest(rows)
+        try:
+            await self.sink.send(title, message)
+        except PushError as e:
+            self.attempts += 1
+            max_attempts = PUSH_MAX_ATTEMPTS if e.retryable else 0
+            await asyncio.to_thread(retry_notifications, ids, now + backoff(self.attempts), str(e), max_attempts)
+            print(f"Push failed for {len(ids)} notifications: {e}")
+            return 0
+        self.attempts = 0
+        await asyncio.to_thread(mark_notifications_sent, ids, time.time())
+        return len(ids)
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.send_due()
+            except Exception as e:
+                print(f"Error sending push notifications: {e}")
+            await asyncio.sleep(PUSH_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    # The trading floor sends notifications itself; run this when traders run without it, e.g. from the notebooks
+    asyncio.run(PushSender().run_forever())
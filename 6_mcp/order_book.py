@@ -0,0 +1,97 @@
+import numpy as np
+import clock
+from accounts import Account, Order
+from database import close_order, read_account_state, read_open_orders, read_orders, transaction, write_log, write_order
+from market import get_share_prices
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_TYPES = ("limit", "stop")
+
+
+def _now() -> str:
+    return clock.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def place_order(name: str, symbol: str, side: str, order_type: str, quantity: int, trigger_price: float, rationale: str) -> int:
+    """
+    Place a standing order that fills at the market price once the price reaches trigger_price.
+    A limit order buys at or below its price, or sells at or above it; a stop order buys at or above
+    its price, or sells at or below it. Returns the order id.
+    """
+    if side not in ORDER_SIDES:
+        raise ValueError(f"Order side must be one of {ORDER_SIDES}")
+    if order_type not in ORDER_TYPES:
+        raise ValueError(f"Order type must be one of {ORDER_TYPES}")
+    if quantity <= 0 or trigger_price <= 0:
+        raise ValueError("Order quantity and price must be positive.")
+    if read_account_state(name) is None:
+        raise ValueError(f"There is no account named {name}")
+    # An unknown symbol prices at 0, so its order could never trigger and would be re-checked on every sweep
+    if not get_share_prices([symbol]).get(symbol):
+        raise ValueError(f"Unrecognized symbol {symbol}")
+    order_id = write_order(name, symbol, side, order_type, quantity, trigger_price, rationale, _now())
+    write_log(name, "account", f"Placed {order_type} order {order_id} to {side} {quantity} of {symbol} at {trigger_price}")
+    return order_id
+
+
+def cancel_order(name: str, order_id: int) -> bool:
+    """Cancel one of the account's open orders. Returns False if it isn't open or isn't theirs."""
+    cancelled = close_order(order_id, "cancelled", _now(), name=name)
+    if cancelled:
+        write_log(name, "account", f"Cancelled order {order_id}")
+    return cancelled
+
+
+def list_orders(name: str, status: str | None = "open") -> list[dict]:
+    return read_orders(name, status)
+
+
+def triggered(sides: np.ndarray, types: np.ndarray, trigger_prices: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """Which orders the prices have reached, for arrays of order sides, types and trigger prices."""
+    buy = sides == "buy"
+    limit = types == "limit"
+    at_or_below = prices <= trigger_prices
+    at_or_above = prices >= trigger_prices
+    # A limit buy or stop sell waits for the price to fall; a limit sell or stop buy waits for it to rise
+    reached = np.where(buy == limit, at_or_below, at_or_above)
+    return reached & (prices > 0)
+
+
+def match_orders(prices: dict[str, float] | None = None) -> int:
+    """
+    Sweep every open order against one bulk price snapshot and fill those whose trigger has been reached.
+    The trigger check is a single vectorized pass. Each fill runs in its own transaction, which also
+    claims the order, so two sweeps running at once can never fill the same order twice. An order that
+    can't be filled, e.g. for lack of funds or shares, is rejected. Returns the number of orders filled.
+    """
+    rows = read_open_orders()
+    if not rows:
+        return 0
+    ids, names, symbols, sides, types, quantities, trigger_prices, rationales = (np.array(column) for column in zip(*rows))
+    if prices is None:
+        prices = get_share_prices(np.unique(symbols).tolist())
+    current = np.array([prices.get(symbol, 0.0) for symbol in symbols], dtype=float)
+    hits = np.flatnonzero(triggered(sides, types, trigger_prices.astype(float), current))
+    timestamp = _now()
+    accounts = {}
+    filled = 0
+    for i in hits:
+        name = str(names[i])
+        if name not in accounts:
+            accounts[name] = Account.get(name, with_transactions=False)
+        account = accounts[name]
+        order = Order(symbol=str(symbols[i]), side=str(sides[i]), quantity=int(quantities[i]), rationale=str(rationales[i]))
+        order_id = int(ids[i])
+        try:
+            with transaction():
+                if not close_order(order_id, "filled", timestamp, f"Filled at market price {current[i]}"):
+                    continue
+                account.refresh()
+                account.fill_order(order, float(current[i]), timestamp)
+        except ValueError as e:
+            close_order(order_id, "rejected", timestamp, str(e))
+            write_log(name, "account", f"Rejected {types[i]} order {order_id}: {e}")
+            continue
+        filled += 1
+        write_log(name, "account", f"Filled {types[i]} order {order_id}: {order.side} {order.quantity} of {order.symbol}")
+    return filled
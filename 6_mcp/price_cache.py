@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+from database import read_prices, write_prices
+
+# How long a price is fresh for each Polygon plan, and how much longer a stale price may be served
+# while it is refreshed in the background
+PRICE_TTL_SECONDS = {"realtime": 5.0, "paid": 60.0, "eod": 900.0}
+PRICE_STALE_SECONDS = float(os.getenv("PRICE_STALE_SECONDS", "120"))
+
+
+class PriceCache:
+    """
+    A share price cache shared by every thread in the process, backed by the prices table so that
+    separate MCP server processes share what each of them fetched.
+    Fresh prices are served from memory or the database. Prices up to stale_seconds past their TTL are
+    served immediately while a background refresh fetches new ones (stale-while-revalidate).
+    Anything older is fetched, and concurrent requests for the same symbol wait on a single fetch.
+    """
+
+    def __init__(self, fetch: Callable[[list[str]], dict[str, float]], ttl: float, stale_seconds: float = PRICE_STALE_SECONDS):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.hits = 0
+        self.misses = 0
+        self._prices = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-refresh")
+
+    def _serve(self, symbol: str, entry: tuple[float, float] | None, now: float, result: dict, stale: list) -> bool:
+        """Add a cached price to the result unless it has expired, noting it for refresh if stale."""
+        if entry is None:
+            return False
+        price, fetched_at = entry
+        age = now - fetched_at
+        if age >= self.ttl + self.stale_seconds:
+            return False
+        result[symbol] = price
+        if age >= self.ttl:
+            stale.append(symbol)
+        return True
+
+    def _store(self, entries: dict[str, tuple[float, float]]) -> None:
+        with self._lock:
+            for symbol, (price, fetched_at) in entries.items():
+                if symbol not in self._prices or self._prices[symbol][1] < fetched_at:
+                    self._prices[symbol] = (price, fetched_at)
+
+    def _fetch(self, symbols: list[str]) -> dict[str, float]:
+        """Fetch symbols, joining any fetch already in flight for a symbol rather than repeating it."""
+        owned, waiting = [], {}
+        with self._lock:
+            for symbol in symbols:
+                if symbol in self._inflight:
+                    waiting[symbol] = self._inflight[symbol]
+                else:
+                    self._inflight[symbol] = Future()
+                    owned.append(symbol)
+        result = {}
+        if owned:
+            try:
+                fetched = self.fetch(owned)
+                # Symbols the fetcher doesn't know are priced at 0, like an unrecognized symbol
+                prices = {symbol: fetched.get(symbol, 0.0) for symbol in owned}
+                fetched_at = time.time()
+                self._store({symbol: (price, fetched_at) for symbol, price in prices.items()})
+                write_prices(prices, fetched_at)
+                result.update(prices)
+            except BaseException as e:
+                with self._lock:
+                    futures = [self._inflight.pop(symbol) for symbol in owned]
+                for future in futures:
+                    future.set_exception(e)
+                raise
+            with self._lock:
+                futures = [(symbol, self._inflight.pop(symbol)) for symbol in owned]
+            for symbol, future in futures:
+                future.set_result(prices[symbol])
+        for symbol, future in waiting.items():
+            result[symbol] = future.result()
+        return result
+
+    def _refresh(self, symbols: list[str]) -> None:
+        try:
+            self._fetch(symbols)
+        except Exception as e:
+            print(f"Background price refresh failed: {e}")
+
+    def get_many(self, symbols: list[str]) -> dict[str, float]:
+        now = time.time()
+        result, stale = {}, []
+        with self._lock:
+            unknown = [symbol for symbol in symbols if not self._serve(symbol, self._prices.get(symbol), now, result, stale)]
+        missing = []
+        if unknown:
+            stored = read_prices(unknown)
+            self._store(stored)
+            missing = [symbol for symbol in unknown if not self._serve(symbol, stored.get(symbol), now, result, stale)]
+        self.hits += len(symbols) - len(missing)
+        self.misses += len(missing)
+        if stale:
+            with self._lock:
+                stale = [symbol for symbol in stale if symbol not in self._inflight]
+            if stale:
+                self._refresher.submit(self._refresh, stale)
+        if missing:
+            result.update(self._fetch(missing))
+        return {symbol: result[symbol] for symbol in symbols}
@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+from datetime import date
+from functools import lru_cache
+import numpy as np
+
+DATES_FILE = "dates.npy"
+CLOSES_FILE = "closes.npy"
+SYMBOLS_FILE = "symbols.json"
+# How far back to look for a symbol's last close when it has no bar on the requested day
+CARRY_FORWARD_DAYS = 10
+
+
+class PriceStore:
+    """
+    Daily closing prices held as columnar NumPy arrays and memory-mapped from disk:
+    dates.npy is a sorted datetime64[D] vector, closes.npy a float32 matrix of dates x symbols
+    with NaN where a symbol has no bar, and symbols.json the column order.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.dates = np.load(os.path.join(directory, DATES_FILE), mmap_mode="r")
+        self.closes = np.load(os.path.join(directory, CLOSES_FILE), mmap_mode="r")
+        with open(os.path.join(directory, SYMBOLS_FILE)) as f:
+            self.symbols = json.load(f)
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def trading_days(self, start: date, end: date) -> list[date]:
+        lo = np.searchsorted(self.dates, np.datetime64(start, "D"), side="left")
+        hi = np.searchsorted(self.dates, np.datetime64(end, "D"), side="right")
+        return [day.astype(date) for day in self.dates[lo:hi]]
+
+    def prices_as_of(self, symbols: list[str], as_of: date) -> dict[str, float]:
+        """The most recent close on or before as_of for each symbol; 0.0 for unknown symbols, as with live data."""
+        row = int(np.searchsorted(self.dates, np.datetime64(as_of, "D"), side="right")) - 1
+        prices = dict.fromkeys(symbols, 0.0)
+        if row < 0:
+            return prices
+        known = [symbol for symbol in symbols if symbol in self.columns]
+        if not known:
+            return prices
+        columns = np.array([self.columns[symbol] for symbol in known])
+        window = np.asarray(self.closes[max(0, row + 1 - CARRY_FORWARD_DAYS) : row + 1, columns])
+        has_bar = ~np.isnan(window)
+        latest = window.shape[0] - 1 - np.argmax(has_bar[::-1], axis=0)
+        values = window[latest, np.arange(len(known))]
+        prices.update({symbol: float(value) for symbol, value, found in zip(known, values, has_bar.any(axis=0)) if found})
+        return prices
+
+    @staticmethod
+    def build(directory: str, bars) -> "PriceStore":
+        """Write a store from a pandas frame of daily bars with date, symbol and close columns."""
+        import pandas as pd  # only needed to build a store, so MCP servers don't pay for the import
+
+        os.makedirs(directory, exist_ok=True)
+        table = bars.assign(date=pd.to_datetime(bars["date"]).dt.normalize()).pivot_table(
+            index="date", columns="symbol", values="close", aggfunc="last"
+        )
+        table = table.sort_index()
+        np.save(os.path.join(directory, DATES_FILE), table.index.values.astype("datetime64[D]"))
+        np.save(os.path.join(directory, CLOSES_FILE), table.to_numpy(dtype=np.float32))
+        with open(os.path.join(directory, SYMBOLS_FILE), "w") as f:
+            json.dump(list(table.columns), f)
+        return PriceStore(directory)
+
+
+@lru_cache(maxsize=4)
+def get_price_store(directory: str) -> PriceStore:
+    return PriceStore(directory)
+
+
+if __name__ == "__main__":
+    # Usage: python price_store.py bars.csv backtest_data
+    import pandas as pd
+
+    PriceStore.build(sys.argv[2], pd.read_csv(sys.argv[1]))
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from dotenv import load_dotenv
+from database import prune_research, read_research, read_research_candidates, write_research
+
+load_dotenv(override=True)
+
+RESEARCH_CACHE = os.getenv("RESEARCH_CACHE", "true").strip().lower() == "true"
+RESEARCH_CACHE_TTL_SECONDS = int(os.getenv("RESEARCH_CACHE_TTL_SECONDS", "3600"))
+RESEARCH_CACHE_BUCKET_SECONDS = int(os.getenv("RESEARCH_CACHE_BUCKET_SECONDS", "3600"))
+# Queries whose word sets overlap at least this much (Jaccard) are treated as the same research
+RESEARCH_CACHE_SIMILARITY = float(os.getenv("RESEARCH_CACHE_SIMILARITY", "0.75"))
+
+# Words that don't change what a news search finds
+STOP_WORDS = {
+    "a", "about", "an", "and", "any", "are", "for", "from", "in", "is", "latest", "me", "new", "news", "of",
+    "on", "recent", "the", "to", "today", "todays", "what", "with",
+}
+TRACKING_PARAMETERS = re.compile(r"^(utm_\w+|fbclid|gclid|ref)$")
+
+
+def query_words(query: str) -> list[str]:
+    """The distinct meaningful words of a query, lowercased and sorted, so word order and filler don't matter."""
+    words = set(re.findall(r"[a-z0-9]+", query.lower())) - STOP_WORDS
+    return sorted(words) or sorted(set(re.findall(r"[a-z0-9]+", query.lower())))
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase the scheme and host and drop the fragment, tracking parameters and any trailing slash."""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMETERS.match(k)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+
+def normalize(arguments: dict | None) -> tuple[dict, list[str]]:
+    """
+    The arguments in canonical form, plus the words used for near-duplicate matching. Free-text queries
+    become their sorted meaningful words and URLs are normalized; other arguments are kept as they are.
+    """
+    canonical, words = {}, []
+    for name, value in sorted((arguments or {}).items()):
+        if isinstance(value, str) and name in ("query", "q"):
+            words = query_words(value)
+            canonical[name] = " ".join(words)
+        elif isinstance(value, str) and name == "url":
+            canonical[name] = normalize_url(value)
+        else:
+            canonical[name] = value
+    return canonical, words
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class ResearchCache:
+    """
+    A floor-wide cache of research tool results, such as web searches and page fetches, kept in the
+    shared database so that every trader and worker process benefits. Results are keyed by tool,
+    normalized arguments and time bucket, and expire after the TTL. A search whose words closely match
+    one already made in the same bucket reuses its results; other arguments, such as the result count
+    or page offset, must match exactly. Concurrent identical calls in one process share a single request.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = RESEARCH_CACHE_TTL_SECONDS,
+        bucket_seconds: int = RESEARCH_CACHE_BUCKET_SECONDS,
+        threshold: float = RESEARCH_CACHE_SIMILARITY,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.bucket_seconds = bucket_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+    @staticmethod
+    def key(canonical: dict) -> str:
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+    def lookup(self, tool: str, canonical: dict, words: list[str], now: float) -> str | None:
+        bucket = int(now // self.bucket_seconds)
+        created_after = now - self.ttl_seconds
+        result = read_research(tool, self.key(canonical), bucket, created_after)
+        if result is not None or not words:
+            return result
+        # Near-duplicate searches must agree on everything but the query text
+        others = {name: value for name, value in canonical.items() if name not in ("query", "q")}
+        wanted = set(words)
+        best, best_score = None, self.threshold
+        for _, candidate_words, candidate in read_research_candidates(tool, bucket, created_after):
+            stored = json.loads(candidate_words)
+            if stored.get("others") != others:
+                continue
+            score = similarity(wanted, set(stored["words"]))
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def store(self, tool: str, canonical: dict, words: list[str], now: float, result: str) -> None:
+        others = {name: value for name, value in canonical.items() if name not in ("query", "q")}
+        write_research(
+            tool, self.key(canonical), int(now // self.bucket_seconds),
+            json.dumps({"words": words, "others": others}, default=str), now, result,
+        )
+
+    async def get_or_call(self, tool: str, arguments: dict | None, call, serialize, deserialize):
+        """
+        Return the cached result for this tool call, or make it with `call()` and cache it when
+        `serialize` returns something; results that shouldn't be cached, like errors, serialize to None.
+        """
+        canonical, words = normalize(arguments)
+        now = time.time()
+        cached = await asyncio.to_thread(self.lookup, tool, canonical, words, now)
+        if cached is not None:
+            self.hits += 1
+            return deserialize(cached)
+        flight = (tool, self.key(canonical))
+        if flight in self._in_flight:
+            self.hits += 1
+            return await asyncio.shield(self._in_flight[flight])
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight] = future
+        try:
+            result = await call()
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # don't warn about it when no other caller was waiting
+            raise
+        finally:
+            del self._in_flight[flight]
+        saved = serialize(result)
+        if saved is not None:
+            await asyncio.to_thread(self.store, tool, canonical, words, now, saved)
+        return result
+
+    def prune(self) -> int:
+        return prune_research(time.time() - self.ttl_seconds)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"Research cache: {self.hits} hits, {self.misses} misses, {rate:.0%} hit rate"
+
+
+research_cache = ResearchCache()
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from traders import Trader, get_provider
+
+PROVIDER_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "4"))
+STAGGER_SECONDS = float(os.getenv("STAGGER_SECONDS", "30"))
+
+
+class TradingScheduler:
+    """
+    Runs every trader once per interval on a fixed-rate schedule aligned to the wall clock
+    (e.g. on the hour for a 60 minute interval), so that rounds don't drift by however long they took.
+    Each trader start is jittered by up to stagger_seconds, traders on the same LLM provider share a
+    semaphore of provider_concurrency slots, a run that exceeds deadline_seconds is cancelled, and a trader
+    whose previous run is still going when the next tick arrives is skipped for that tick.
+    """
+
+    def __init__(
+        self,
+        traders: list[Trader],
+        interval_minutes: float,
+        fleet=None,
+        deadline_seconds: float | None = None,
+        stagger_seconds: float = STAGGER_SECONDS,
+        provider_concurrency: int = PROVIDER_CONCURRENCY,
+        on_status=None,
+    ):
+        self.traders = traders
+        self.interval = interval_minutes * 60
+        self.fleet = fleet
+        self.deadline_seconds = deadline_seconds or self.interval
+        self.stagger_seconds = stagger_seconds
+        self.provider_limits = defaultdict(lambda: asyncio.Semaphore(provider_concurrency))
+        self.running = {}
+        self.on_status = on_status
+
+    def report(self, trader: Trader, status: str, seconds: float = 0.0) -> None:
+        """Pass a trader's status ('started', 'finished', 'timed out' or 'skipped') to the on_status callback."""
+        if self.on_status:
+            self.on_status(trader.name, status, seconds)
+
+    def next_tick(self, now: float | None = None) -> float:
+        """The next wall clock time, in epoch seconds, that is a whole multiple of the interval."""
+        now = time.time() if now is None else now
+        return (now // self.interval + 1) * self.interval
+
+    async def run_trader(self, trader: Trader) -> None:
+        await asyncio.sleep(random.uniform(0, self.stagger_seconds))
+        async with self.provider_limits[get_provider(trader.model_name)]:
+            start = time.monotonic()
+            self.report(trader, "started")
+            try:
+                await asyncio.wait_for(trader.run(self.fleet), self.deadline_seconds)
+                self.report(trader, "finished", time.monotonic() - start)
+            except asyncio.TimeoutError:
+                print(f"Trader {trader.name} missed its {self.deadline_seconds:.0f}s deadline and was cancelled")
+                self.report(trader, "timed out", time.monotonic() - start)
+
+    def tick(self) -> list[asyncio.Task]:
+        """Start a run for every trader that isn't still busy with the previous one."""
+        started = []
+        for trader in self.traders:
+            task = self.running.get(trader.name)
+            if task and not task.done():
+                print(f"Trader {trader.name} is still running; skipping this tick")
+                self.report(trader, "skipped")
+                continue
+            task = asyncio.create_task(self.run_trader(trader), name=f"trader-{trader.name}")
+            task.add_done_callback(self.check_run)
+            self.running[trader.name] = task
+            started.append(task)
+        return started
+
+    @staticmethod
+    def check_run(task: asyncio.Task) -> None:
+        """Log the exception of a run that failed, since nothing awaits the tasks in self.running."""
+        if not task.cancelled() and task.exception() is not None:
+            print(f"{task.get_name()} failed: {task.exception()!r}")
+
+    async def run_forever(self, should_run, after_tick=None) -> None:
+        """
+        Tick immediately and then on each aligned interval. should_run is a blocking check, such as
+        whether the market is open; after_tick is optional blocking housekeeping; both run in a thread.
+        """
+        while True:
+            if await asyncio.to_thread(should_run):
+                self.tick()
+            else:
+                print("Market is closed, skipping run")
+            if after_tick:
+                await asyncio.to_thread(after_tick)
+            await asyncio.sleep(max(0.0, self.next_tick() - time.time()))
@@ -0,0 +1,146 @@
+import os
+import zlib
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+import numpy as np
+
+SYNTHETIC_MARKET_SEED = int(os.getenv("SYNTHETIC_MARKET_SEED", "42"))
+SYNTHETIC_SYMBOLS = int(os.getenv("SYNTHETIC_SYMBOLS", "2048"))
+SYNTHETIC_DAYS = int(os.getenv("SYNTHETIC_DAYS", "730"))
+
+# Trading day 0 of the simulated history. Only weekdays are trading days; the history repeats every
+# `days` trading days, each repeat continuing from where the last one closed
+EPOCH = date(2025, 1, 1)
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+STEP_MINUTES = 5
+STEPS_PER_DAY = 78  # 6.5 hour session in 5 minute steps
+TRADING_DAYS_PER_YEAR = 252
+
+
+class SyntheticMarket:
+    """
+    Seeded geometric Brownian motion prices for thousands of symbols, for running the floor offline.
+    Every symbol hashes to one of `capacity` slots, each with its own start price, drift and volatility.
+    Daily open/high/low/close bars for every slot are preallocated as float32 matrices of slots x trading
+    days; weekends carry Friday's close. Before and after the matrices the history repeats, shifted by each
+    slot's total log return so that prices stay continuous across the seam. Intraday prices follow a Brownian bridge between each day's open and close in 5 minute steps, scaled
+    to stay within the day's range, and are generated a whole day at a time for all slots.
+    Prices depend only on the seed, the symbol and the time, so every process sees the same market.
+    """
+
+    def __init__(self, seed: int = SYNTHETIC_MARKET_SEED, capacity: int = SYNTHETIC_SYMBOLS, days: int = SYNTHETIC_DAYS):
+        self.seed = seed
+        self.capacity = capacity
+        self.days = days
+        rng = np.random.default_rng(seed)
+        start = np.clip(rng.lognormal(np.log(80), 0.8, capacity), 2, 2000)
+        volatility = rng.uniform(0.15, 0.6, capacity)
+        drift = rng.normal(0.07, 0.1, capacity)
+        daily_vol = volatility / np.sqrt(TRADING_DAYS_PER_YEAR)
+        shocks = rng.standard_normal((capacity, days), dtype=np.float32)
+        log_returns = (drift / TRADING_DAYS_PER_YEAR - daily_vol**2 / 2)[:, None] + daily_vol[:, None] * shocks
+        self.log_close = (np.log(start)[:, None] + np.cumsum(log_returns, axis=1)).astype(np.float32)
+        self.log_open = np.empty_like(self.log_close)
+        self.log_open[:, 0] = np.log(start)
+        self.log_open[:, 1:] = self.log_close[:, :-1]
+        wicks = np.abs(rng.standard_normal((2, capacity, days), dtype=np.float32)) * daily_vol[None, :, None]
+        self.log_high = np.maximum(self.log_open, self.log_close) + wicks[0]
+        self.log_low = np.minimum(self.log_open, self.log_close) - wicks[1]
+        self.step_vol = (daily_vol / np.sqrt(STEPS_PER_DAY)).astype(np.float32)
+        # The log return of one pass through the history, added per repeat to keep prices continuous
+        self.cycle_return = (self.log_close[:, -1] - self.log_open[:, 0]).astype(np.float64)
+
+    def slots(self, symbols: list[str]) -> np.ndarray:
+        return np.array([zlib.crc32(symbol.upper().encode()) % self.capacity for symbol in symbols], dtype=np.int64)
+
+    @staticmethod
+    def trading_day(day: date) -> int:
+        """The number of trading days from EPOCH to this day; a weekend counts as the Friday before it."""
+        return int(np.busday_count(EPOCH, np.busday_offset(day, 0, roll="backward")))
+
+    def locate(self, trading_day: int) -> tuple[int, int]:
+        """The column of the matrices for this trading day, and how many repeats of the history it's shifted by."""
+        return trading_day % self.days, trading_day // self.days
+
+    @staticmethod
+    def step(moment: datetime) -> int:
+        """The 5 minute step of the session; before the open it's -1, the previous close, and after the close,
+        or on a weekend, it's the last."""
+        if not np.is_busday(moment.date()):
+            return STEPS_PER_DAY - 1
+        if moment.time() < MARKET_OPEN:
+            return -1
+        minutes = (moment.hour * 60 + moment.minute) - (MARKET_OPEN.hour * 60 + MARKET_OPEN.minute)
+        return min(minutes // STEP_MINUTES, STEPS_PER_DAY - 1)
+
+    @lru_cache(maxsize=4)
+    def intraday(self, day: int) -> np.ndarray:
+        """Log prices for every slot at every step of this day, as a slots x steps matrix."""
+        rng = np.random.default_rng([self.seed, day])
+        walk = np.cumsum(rng.standard_normal((self.capacity, STEPS_PER_DAY), dtype=np.float32), axis=1)
+        walk *= self.step_vol[:, None]
+        progress = np.arange(1, STEPS_PER_DAY + 1, dtype=np.float32) / STEPS_PER_DAY
+        bridge = walk - progress * walk[:, -1:]
+        opens, closes = self.log_open[:, day : day + 1], self.log_close[:, day : day + 1]
+        highs, lows = self.log_high[:, day : day + 1], self.log_low[:, day : day + 1]
+        # Shrink each bridge just enough that the path stays within the day's high and low wicks
+        room_up = (highs - np.maximum(opens, closes))[:, 0] / np.maximum(bridge.max(axis=1), 1e-9)
+        room_down = (np.minimum(opens, closes) - lows)[:, 0] / np.maximum(-bridge.min(axis=1), 1e-9)
+        bridge *= np.minimum(1.0, np.minimum(room_up, room_down))[:, None]
+        path = opens + progress * (closes - opens) + bridge
+        return np.clip(path, lows, highs)
+
+    def prices(self, symbols: list[str], moment: datetime) -> dict[str, float]:
+        slots = self.slots(symbols)
+        (day, cycle), step = self.locate(self.trading_day(moment.date())), self.step(moment)
+        if step < 0:
+            values = self.log_open[slots, day]
+        else:
+            values = self.intraday(day)[slots, step]
+        values = values + cycle * self.cycle_return[slots]
+        return {symbol: round(float(price), 2) for symbol, price in zip(symbols, np.exp(values))}
+
+    def is_market_open(self, moment: datetime) -> bool:
+        return moment.weekday() < 5 and MARKET_OPEN <= moment.time() < MARKET_CLOSE
+
+    def daily_bars(self, symbol: str, start: date, end: date) -> list[dict]:
+        """Daily open/high/low/close bars for the symbol's trading days from start to end inclusive, like Polygon's aggregates."""
+        dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        dates = [day for day in dates if np.is_busday(day)]
+        days, cycles = self.locate(np.array([self.trading_day(day) for day in dates], dtype=np.int64))
+        slot = self.slots([symbol])[0]
+        shift = cycles * self.cycle_return[slot]
+        bars = np.exp(np.stack([m[slot, days] + shift for m in (self.log_open, self.log_high, self.log_low, self.log_close)]))
+        return [
+            {"date": day.isoformat(), "open": round(float(o), 2), "high": round(float(h), 2), "low": round(float(l), 2), "close": round(float(c), 2)}
+            for day, o, h, l, c in zip(dates, *bars)
+        ]
+
+    def previous_close(self, symbol: str, moment: datetime) -> dict:
+        """The bar for the trading day before this moment, like Polygon's previous close."""
+        previous = np.busday_offset(moment.date(), -1, roll="forward").astype(date)
+        return {"ticker": symbol, **self.daily_bars(symbol, previous, previous)[0]}
+
+    def snapshot(self, symbol: str, moment: datetime) -> dict:
+        """The latest price with today's open, high and low so far and the change on the previous close, like Polygon's snapshot."""
+        slot = self.slots([symbol])[0]
+        (day, cycle), step = self.locate(self.trading_day(moment.date())), self.step(moment)
+        shift = cycle * self.cycle_return[slot]
+        prev_close = float(np.exp(self.log_open[slot, day] + shift))  # each day opens at the previous close
+        session = np.exp(self.intraday(day)[slot, : step + 1] + shift) if step >= 0 else np.array([prev_close])
+        price = float(session[-1])
+        return {
+            "ticker": symbol,
+            "price": round(price, 2),
+            "day_open": round(prev_close, 2),
+            "day_high": round(float(session.max()), 2),
+            "day_low": round(float(session.min()), 2),
+            "prev_close": round(prev_close, 2),
+            "todays_change_percent": round((price / prev_close - 1) * 100, 2),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_synthetic_market() -> SyntheticMarket:
+    return SyntheticMarket()
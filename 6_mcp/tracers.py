@@ -1,10 +1,33 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from database import write_logs
+from datetime import datetime, timezone
+import asyncio
+import atexit
+import os
+import queue
 import secrets
 import string
+import threading
+import time
 
 ALPHANUM = string.ascii_lowercase + string.digits 
 
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "250"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_FLUSH = object()
+_STOP = object()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
 def make_trace_id(tag: str) -> str:
     """
     Return a string of the form 'trace_<tag><random>',
@@ -15,8 +38,106 @@ def make_trace_id(tag: str) -> str:
     random_suffix = ''.join(secrets.choice(ALPHANUM) for _ in range(pad_len))
     return f"trace_{tag}{random_suffix}"
 
+class LogSink:
+    """
+    Background writer for log rows. Rows are queued by the caller and written by a
+    single thread in batches, one transaction every LOG_FLUSH_INTERVAL_MS or LOG_BATCH_SIZE rows.
+    The queue is bounded so memory stays bounded. When it is full, callers on a plain thread wait
+    for room, but callers on the agents' event loop must never wait, so their rows are dropped
+    rather than stalling every trader in the process. Dropped rows are counted, and the writer
+    records how many were lost as a log row of their own, so the gap shows in the log.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = LOG_FLUSH_INTERVAL_MS,
+        batch_size: int = LOG_BATCH_SIZE,
+        max_queue: int = LOG_QUEUE_SIZE,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._reported = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                    self._thread.start()
+
+    def write(self, name: str, type: str, message: str) -> None:
+        self._ensure_started()
+        row = (name, datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), type, message)
+        if not _on_event_loop():
+            self._queue.put(row)
+            return
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_batch(self, batch: list) -> None:
+        dropped = self.dropped - self._reported
+        if dropped:
+            self._reported += dropped
+            message = f"Dropped {dropped} log rows because the log queue was full ({self._reported} in total)"
+            print(message)
+            batch = batch + [("log_sink", datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), "log_sink", message)]
+        if batch:
+            try:
+                write_logs(batch)
+            except Exception as e:
+                print(f"Log sink failed to write {len(batch)} rows: {e}")
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            is_control = item is _FLUSH or item is _STOP
+            if item is not None and not is_control:
+                batch.append(item)
+            if item is None or is_control or len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                for _ in range(len(batch) + is_control):
+                    self._queue.task_done()
+                batch = []
+                deadline = None
+                if item is _STOP:
+                    return
+            elif deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+    def flush(self) -> None:
+        """Block until every row queued so far has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def shutdown(self) -> None:
+        """Drain the queue and stop the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+
 class LogTracer(TracingProcessor):
 
+    def __init__(self, sink: LogSink | None = None):
+        self.sink = sink or LogSink()
+        atexit.register(self.sink.shutdown)
+
+    def write_log(self, name: str, type: str, message: str) -> None:
+        self.sink.write(name, type, message)
+
     def get_name(self, trace_or_span: Trace | Span) -> str | None:
         trace_id = trace_or_span.trace_id
         name = trace_id.split("_")[1]
@@ -28,12 +149,12 @@ class LogTracer(TracingProcessor):
     def on_trace_start(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Started: {trace.name}")
+            self.write_log(name, "trace", f"Started: {trace.name}")
 
     def on_trace_end(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Ended: {trace.name}")
+            self.write_log(name, "trace", f"Ended: {trace.name}")
 
     def on_span_start(self, span) -> None:
         name = self.get_name(span)
@@ -49,7 +170,7 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.write_log(name, type, message)
 
     def on_span_end(self, span) -> None:
         name = self.get_name(span)
@@ -66,10 +187,10 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.write_log(name, type, message)
 
     def force_flush(self) -> None:
-        pass
+        self.sink.flush()
 
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        self.sink.shutdown()
\ No newline at end of file
@@ -1,11 +1,9 @@
 from contextlib import AsyncExitStack
-from accounts_client import read_accounts_resource, read_strategy_resource
+from accounts_client import read_summary_resource, read_strategy_resource
 from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
-from openai import AsyncOpenAI
+from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace, set_default_openai_client
 from dotenv import load_dotenv
 import os
-import json
 from agents.mcp import MCPServerStdio
 from templates import (
     researcher_instructions,
@@ -15,6 +13,7 @@ from templates import (
     research_tool,
 )
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+import llm_cache
 
 load_dotenv(override=True)
 
@@ -22,6 +21,7 @@ deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
 google_api_key = os.getenv("GOOGLE_API_KEY")
 grok_api_key = os.getenv("GROK_API_KEY")
 openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+openai_api_key = os.getenv("OPENAI_API_KEY")
 
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 GROK_BASE_URL = "https://api.x.ai/v1"
@@ -30,37 +30,58 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 MAX_TURNS = 30
 
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+openrouter_client = llm_cache.openai_client(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
+deepseek_client = llm_cache.openai_client(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
+grok_client = llm_cache.openai_client(base_url=GROK_BASE_URL, api_key=grok_api_key)
+gemini_client = llm_cache.openai_client(base_url=GEMINI_BASE_URL, api_key=google_api_key)
 
+# OpenAI models are passed to the SDK by name, so route its default client through the cache too
+if llm_cache.enabled():
+    set_default_openai_client(llm_cache.openai_client(api_key=openai_api_key), use_for_tracing=False)
 
-def get_model(model_name: str):
+
+provider_clients = {
+    "openrouter": openrouter_client,
+    "deepseek": deepseek_client,
+    "grok": grok_client,
+    "gemini": gemini_client,
+}
+
+
+def get_provider(model_name: str) -> str:
+    """The provider that serves this model; traders on the same provider share its rate limits."""
     if "/" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
+        return "openrouter"
     elif "deepseek" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
+        return "deepseek"
     elif "grok" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
+        return "grok"
     elif "gemini" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
+        return "gemini"
+    else:
+        return "openai"
+
+
+def get_model(model_name: str):
+    provider = get_provider(model_name)
+    if provider in provider_clients:
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=provider_clients[provider])
     else:
         return model_name
 
 
-async def get_researcher(mcp_servers, model_name) -> Agent:
+async def get_researcher(mcp_servers, model_name, name) -> Agent:
     researcher = Agent(
         name="Researcher",
-        instructions=researcher_instructions(),
+        instructions=researcher_instructions(name),
         model=get_model(model_name),
         mcp_servers=mcp_servers,
     )
     return researcher
 
 
-async def get_researcher_tool(mcp_servers, model_name) -> Tool:
-    researcher = await get_researcher(mcp_servers, model_name)
+async def get_researcher_tool(mcp_servers, model_name, name) -> Tool:
+    researcher = await get_researcher(mcp_servers, model_name, name)
     return researcher.as_tool(tool_name="Researcher", tool_description=research_tool())
 
 
@@ -73,7 +94,7 @@ class Trader:
         self.do_trade = True
 
     async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
-        tool = await get_researcher_tool(researcher_mcp_servers, self.model_name)
+        tool = await get_researcher_tool(researcher_mcp_servers, self.model_name, self.name)
         self.agent = Agent(
             name=self.name,
             instructions=trader_instructions(self.name),
@@ -84,10 +105,7 @@ class Trader:
         return self.agent
 
     async def get_account_report(self) -> str:
-        account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+        return await read_summary_resource(self.name)
 
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
         self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
@@ -113,19 +131,28 @@ class Trader:
                     await stack.enter_async_context(
                         MCPServerStdio(params, client_session_timeout_seconds=120)
                     )
-                    for params in researcher_mcp_server_params(self.name)
+                    for params in researcher_mcp_server_params
                 ]
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_fleet(self, fleet):
+        await self.run_agent(fleet.trader_servers, fleet.researcher_servers)
+
+    async def run_with_trace(self, fleet=None):
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
         trace_id = make_trace_id(f"{self.name.lower()}")
-        with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
-
-    async def run(self):
+        with trace(trace_name, trace_id=trace_id, metadata={"trader": self.name, "model": self.model_name}):
+            if fleet:
+                await self.run_with_fleet(fleet)
+            else:
+                await self.run_with_mcp_servers()
+
+    async def run(self, fleet=None):
+        """Run one trading or rebalancing round, using the floor's shared MCP servers if a fleet is given."""
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(fleet)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
-        self.do_trade = not self.do_trade
+        finally:
+            # Alternate even when the run is cancelled, e.g. for missing its deadline
+            self.do_trade = not self.do_trade
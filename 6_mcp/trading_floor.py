@@ -2,10 +2,21 @@ from traders import Trader
 from typing import List
 import asyncio
 from tracers import LogTracer
+from metrics import METRICS_PORT, MetricsProcessor, observe_database_writes, start_metrics_server
 from agents import add_trace_processor
 from market import is_market_open
+from database import prune_logs, prune_span_metrics
+from research_cache import research_cache
+from notifications import PushSender
+from accounts_client import accounts_session
+from mcp_fleet import MCPFleet
+from scheduler import TradingScheduler
+from order_book import match_orders
 from dotenv import load_dotenv
+import multiprocessing
 import os
+import queue
+import time
 
 load_dotenv(override=True)
 
@@ -14,6 +25,10 @@ RUN_EVEN_WHEN_MARKET_IS_CLOSED = (
     os.getenv("RUN_EVEN_WHEN_MARKET_IS_CLOSED", "false").strip().lower() == "true"
 )
 USE_MANY_MODELS = os.getenv("USE_MANY_MODELS", "false").strip().lower() == "true"
+TRADER_DEADLINE_MINUTES = float(os.getenv("TRADER_DEADLINE_MINUTES", str(RUN_EVERY_N_MINUTES)))
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+STATUS_REPORT_SECONDS = 60
+ORDER_MATCH_SECONDS = float(os.getenv("ORDER_MATCH_SECONDS", "60"))
 
 names = ["Warren", "George", "Ray", "Cathie"]
 lastnames = ["Patience", "Bold", "Systematic", "Crypto"]
@@ -38,17 +53,124 @@ def create_traders() -> List[Trader]:
     return traders
 
 
-async def run_every_n_minutes():
-    add_trace_processor(LogTracer())
-    traders = create_traders()
+def prune_history() -> None:
+    prune_logs()
+    prune_span_metrics()
+    research_cache.prune()
+
+
+def should_run() -> bool:
+    return RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open()
+
+
+async def run_order_matching():
+    """Fill standing limit and stop orders against fresh prices every ORDER_MATCH_SECONDS while the market is open."""
     while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+        try:
+            if await asyncio.to_thread(should_run):
+                filled = await asyncio.to_thread(match_orders)
+                if filled:
+                    print(f"Filled {filled} standing orders")
+        except Exception as e:
+            print(f"Error matching orders: {e}")
+        await asyncio.sleep(ORDER_MATCH_SECONDS)
+
+
+async def run_traders(traders: List[Trader], on_status=None, housekeeping: bool = True):
+    """
+    Run these traders on the schedule with their own MCP fleet, in the current process and event loop.
+    The process responsible for housekeeping also prunes logs and metrics after each tick, matches standing
+    orders, sends queued push notifications and serves the metrics endpoint when METRICS_PORT is set.
+    """
+    add_trace_processor(LogTracer())
+    add_trace_processor(MetricsProcessor())
+    observe_database_writes()
+    matcher = asyncio.create_task(run_order_matching()) if housekeeping else None
+    sender = asyncio.create_task(PushSender().run_forever()) if housekeeping else None
+    metrics_server = start_metrics_server() if housekeeping and METRICS_PORT else None
+    try:
+        async with accounts_session(), MCPFleet([trader.name for trader in traders]) as fleet:
+            scheduler = TradingScheduler(
+                traders,
+                RUN_EVERY_N_MINUTES,
+                fleet=fleet,
+                deadline_seconds=TRADER_DEADLINE_MINUTES * 60,
+                on_status=on_status,
+            )
+            await scheduler.run_forever(
+                should_run=should_run,
+                after_tick=prune_history if housekeeping else None,
+            )
+    finally:
+        if matcher:
+            matcher.cancel()
+        if sender:
+            sender.cancel()
+        if metrics_server:
+            metrics_server.shutdown()
+
+
+async def run_every_n_minutes():
+    await run_traders(create_traders())
+
+
+def run_worker(index: int, traders: List[Trader], status_queue) -> None:
+    """Entry point of a worker process: one event loop, MCP fleet and scheduler for its shard of traders."""
+
+    def on_status(name: str, status: str, seconds: float) -> None:
+        status_queue.put((index, os.getpid(), name, status, seconds, time.time()))
+
+    asyncio.run(run_traders(traders, on_status=on_status, housekeeping=index == 0))
+
+
+def shard_traders(traders: List[Trader], workers: int) -> List[List[Trader]]:
+    return [shard for shard in (traders[i::workers] for i in range(workers)) if shard]
+
+
+def status_report(status: dict) -> str:
+    lines = ["Trading floor status:"]
+    for name, (index, pid, state, seconds, at) in sorted(status.items()):
+        duration = f" after {seconds:.0f}s" if seconds else ""
+        lines.append(f"  {name:<10} worker {index} (pid {pid}): {state}{duration} at {time.strftime('%H:%M:%S', time.localtime(at))}")
+    return "\n".join(lines)
+
+
+def run_coordinator(workers: int = WORKER_PROCESSES) -> None:
+    """
+    Shard the traders across worker processes so that each has its own core, event loop and MCP fleet.
+    Workers share the SQLite database, which is safe under WAL, and stream status events back here
+    for a consolidated report.
+    """
+    context = multiprocessing.get_context("spawn")
+    status_queue = context.Queue()
+    processes = [
+        context.Process(target=run_worker, args=(index, shard, status_queue), name=f"trading-floor-{index}")
+        for index, shard in enumerate(shard_traders(create_traders(), workers))
+    ]
+    for process in processes:
+        process.start()
+    status = {}
+    last_report = time.monotonic()
+    try:
+        while any(process.is_alive() for process in processes):
+            try:
+                index, pid, name, state, seconds, at = status_queue.get(timeout=1)
+                status[name] = (index, pid, state, seconds, at)
+            except queue.Empty:
+                pass
+            if status and time.monotonic() - last_report >= STATUS_REPORT_SECONDS:
+                print(status_report(status))
+                last_report = time.monotonic()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
 
 
 if __name__ == "__main__":
     print(f"Starting scheduler to run every {RUN_EVERY_N_MINUTES} minutes")
-    asyncio.run(run_every_n_minutes())
+    if WORKER_PROCESSES > 1:
+        print(f"Sharding traders across {WORKER_PROCESSES} worker processes")
+        run_coordinator(WORKER_PROCESSES)
+    else:
+        asyncio.run(run_every_n_minutes())